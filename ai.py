@@ -0,0 +1,439 @@
+import random
+import threading
+import time
+from functools import lru_cache
+from threats import ThreatTracker
+
+
+# default per-move thinking time in seconds
+DEFAULT_TIME_BUDGET = 0.2
+# default number of transposition table slots
+DEFAULT_TABLE_SIZE = 1 << 18
+# boards with at least this many cells only search moves near stones
+PRUNING_MIN_CELLS = 49
+
+WIN_SCORE = 1_000_000
+# heuristic weight of an open window holding n of one player's stones
+WINDOW_WEIGHTS = (0, 1, 8, 64, 512, 4096, 32768, 262144)
+
+# transposition table bound types
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+@lru_cache(maxsize=None)
+def zobrist_table(size, seed=0):
+    """
+    Returns random 64-bit keys for every (cell, stone) pair on a board.
+
+    Parameters:
+    - size (int): The number of cells on the board.
+    - seed (int): The random seed, so keys are stable across runs.
+
+    Returns:
+    - tuple: One (0, key for X, key for O) tuple per cell index.
+    """
+    rng = random.Random(seed)
+    return tuple((0, rng.getrandbits(64), rng.getrandbits(64)) for _ in range(size))
+
+
+def zobrist_hash(board):
+    """
+    Computes the Zobrist hash of a board from scratch.
+    """
+    keys = zobrist_table(board.size)
+    key = 0
+    for index in range(board.size):
+        stone = board.stone_at(index)
+        if stone:
+            key ^= keys[index][stone]
+    return key
+
+
+def evaluate(board, stone):
+    """
+    Scores a position heuristically from the point of view of stone.
+
+    Every k-window that only one player occupies counts for that player,
+    weighted by how many stones it already holds.
+    """
+    own = board.bits[stone]
+    other = board.bits[3 - stone]
+    weights = WINDOW_WEIGHTS
+    score = 0
+    for mask in board.masks:
+        mine = own & mask
+        theirs = other & mask
+        if mine and not theirs:
+            score += weights[min(mine.bit_count(), 7)]
+        elif theirs and not mine:
+            score -= weights[min(theirs.bit_count(), 7)]
+    return score
+
+
+def rollout(board, stone, rng):
+    """
+    Plays random moves on the board until the game ends. The board is
+    modified; pass a copy.
+
+    Parameters:
+    - board (Board): A position that is not decided yet.
+    - stone (int): The stone to move first.
+    - rng (Random): The random source.
+
+    Returns:
+    - int: The winning stone, or 0 for a draw.
+    """
+    moves = board.legal_moves()
+    rng.shuffle(moves)
+    for move in moves:
+        board.place(move, stone)
+        if board.is_win(move):
+            return stone
+        stone = 3 - stone
+    return 0
+
+
+class RandomPlayer:
+    """
+    A computer player that picks a random legal move.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Initializes the player.
+
+        Parameters:
+        - seed (int or str): The random seed.
+        """
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game):
+        """
+        Returns a random legal move, or None if the game is over.
+        """
+        moves = game.legal_moves()
+        return self.rng.choice(moves) if moves else None
+
+
+class GreedyPlayer:
+    """
+    A computer player that wins if it can, blocks an immediate loss, and
+    otherwise plays the move with the best heuristic score.
+    """
+
+    def __init__(self, seed=None):
+        """
+        Initializes the player.
+
+        Parameters:
+        - seed (int or str): The random seed used to break ties.
+        """
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game):
+        """
+        Returns the greedy move, or None if the game is over.
+        """
+        moves = game.legal_moves()
+        if not moves:
+            return None
+        board = game.board.copy()
+        stone, other = game.to_move, 3 - game.to_move
+        for player in (stone, other):
+            for move in moves:
+                board.place(move, player)
+                won = board.is_win(move)
+                board.remove(move)
+                if won:
+                    return move
+
+        self.rng.shuffle(moves)
+        best_score, best_move = None, None
+        for move in moves:
+            board.place(move, stone)
+            score = evaluate(board, stone)
+            board.remove(move)
+            if best_score is None or score > best_score:
+                best_score, best_move = score, move
+        return best_move
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out.
+    """
+
+
+class TranspositionTable:
+    """
+    A fixed-size hash table of searched positions.
+
+    Slots are indexed by key modulo the capacity. An occupied slot is only
+    replaced by a search at least as deep, unless its entry comes from an
+    earlier move's search, so the table never grows beyond its capacity.
+    """
+
+    def __init__(self, capacity=DEFAULT_TABLE_SIZE):
+        """
+        Initializes an empty table.
+
+        Parameters:
+        - capacity (int): The number of slots.
+        """
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.generation = 0
+
+    def new_search(self):
+        """
+        Marks all stored entries as coming from an earlier search.
+        """
+        self.generation += 1
+
+    def get(self, key):
+        """
+        Returns the (key, depth, score, bound, move, generation) entry for
+        the key, or None.
+        """
+        entry = self.slots[key % self.capacity]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, depth, score, bound, move):
+        """
+        Stores a search result, following the replacement policy.
+        """
+        slot = key % self.capacity
+        entry = self.slots[slot]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[slot] = (key, depth, score, bound, move, self.generation)
+
+
+class AlphaBetaPlayer:
+    """
+    A computer player using iterative-deepening negamax with alpha-beta
+    pruning, Zobrist hashing and a transposition table.
+
+    On large boards a ThreatTracker supplies the moves: wins and forced
+    blocks only, else cells near stones ordered by threat potential. Its
+    incrementally kept score replaces the full evaluate at the leaves.
+    """
+
+    def __init__(
+        self,
+        time_budget=DEFAULT_TIME_BUDGET,
+        max_depth=None,
+        table_size=DEFAULT_TABLE_SIZE,
+        book=None,
+        pruning=None,
+    ):
+        """
+        Initializes the player.
+
+        Parameters:
+        - time_budget (float): Seconds to think per move, or None to always
+          search to max_depth.
+        - max_depth (int): Stop deepening at this depth. Default searches
+          until the time budget runs out or the game tree is exhausted.
+        - table_size (int): The number of transposition table slots.
+        - book (Tablebase or SolutionCache): Perfect-play answers to try
+          before searching (see book.open_book).
+        - pruning (bool): Generate moves with a ThreatTracker. Default is on
+          for boards with at least PRUNING_MIN_CELLS cells.
+        """
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_size)
+        self.book = book
+        self.pruning = pruning
+        self.tracker = None
+        self.nodes = 0
+        self.depth_reached = 0
+        # the search keeps its state on the player, so searches take turns
+        self.lock = threading.Lock()
+        self.aborted = False
+
+    def choose_move(self, game):
+        """
+        Picks a move for the player to move in the given game. Calls from
+        several threads run one after another.
+
+        Parameters:
+        - game (Game): The game to move in. It is not modified.
+
+        Returns:
+        - int: The flat cell index to play, or None if the game is over.
+        """
+        with self.lock:
+            self.aborted = False
+            return self.search(game)
+
+    def abort(self):
+        """
+        Makes the running search, if any, return its best move so far, e.g.
+        because the position changed. Later searches are not affected.
+        """
+        self.aborted = True
+
+    def search(self, game):
+        """
+        Runs one iterative-deepening search; see choose_move.
+        """
+        moves = game.legal_moves()
+        if not moves:
+            return None
+        # the book shares the time budget; a solve that runs out leaves the
+        # rest of it to the search
+        if self.time_budget is None:
+            self.deadline = float("inf")
+        else:
+            self.deadline = time.perf_counter() + self.time_budget
+        if self.book is not None:
+            move = self.book.best_move(game, None if self.time_budget is None else self.deadline)
+            if move is not None:
+                return move
+        board = game.board.copy()
+        self.keys = zobrist_table(board.size)
+        self.nodes = 0
+        self.table.new_search()
+
+        empty = len(moves)
+        pruning = self.pruning
+        if pruning is None:
+            pruning = board.size >= PRUNING_MIN_CELLS
+        self.tracker = ThreatTracker(board, weights=WINDOW_WEIGHTS) if pruning else None
+        if self.tracker is not None:
+            moves = self.tracker.candidates(game.to_move)
+        else:
+            # center-first order for the first iteration
+            center_row, center_col = (board.rows - 1) / 2, (board.cols - 1) / 2
+            moves.sort(
+                key=lambda i: abs(i // board.cols - center_row) + abs(i % board.cols - center_col)
+            )
+        best = moves[0]
+        max_depth = min(self.max_depth or empty, empty)
+        key = zobrist_hash(board)
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self.search_root(board, key, moves, depth, game.to_move)
+            except SearchTimeout:
+                break
+            best = move
+            self.depth_reached = depth
+            # a forced result will not change with deeper search
+            if abs(score) >= WIN_SCORE - board.size:
+                break
+            # search the previous best move first next iteration
+            moves.remove(move)
+            moves.insert(0, move)
+        return best
+
+    def search_root(self, board, key, moves, depth, stone):
+        """
+        Searches every root move to the given depth.
+
+        Returns:
+        - tuple: (score, move) of the best move found.
+        """
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_score, best_move = alpha, moves[0]
+        tracker = self.tracker
+        for move in moves:
+            board.place(move, stone)
+            if board.is_win(move):
+                score = WIN_SCORE
+            else:
+                if tracker is not None:
+                    tracker.place(move, stone)
+                score = -self.negamax(
+                    board, key ^ self.keys[move][stone], depth - 1, -beta, -alpha, 3 - stone, 1
+                )
+                if tracker is not None:
+                    tracker.remove(move, stone)
+            board.remove(move)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+        return best_score, best_move
+
+    def negamax(self, board, key, depth, alpha, beta, stone, ply):
+        """
+        Returns the negamax score of the position for the player to move.
+        The previous move did not end the game.
+        """
+        self.nodes += 1
+        if self.nodes & 255 == 0 and (self.aborted or time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+        if board.is_full():
+            return 0
+        tracker = self.tracker
+        if depth == 0:
+            return evaluate(board, stone) if tracker is None else tracker.evaluate(stone)
+
+        alpha_orig = alpha
+        # the table keeps wins as plies from the stored position, since the
+        # same position comes up at other plies in later searches
+        won = WIN_SCORE - board.size
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                score, bound = entry[2], entry[3]
+                if score >= won:
+                    score -= ply
+                elif score <= -won:
+                    score += ply
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                elif bound == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = board.legal_moves() if tracker is None else tracker.candidates(stone)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        keys = self.keys
+        best_score, best_move = -WIN_SCORE - 1, moves[0]
+        for move in moves:
+            board.place(move, stone)
+            if board.is_win(move):
+                # prefer the quickest win
+                score = WIN_SCORE - ply
+            else:
+                if tracker is not None:
+                    tracker.place(move, stone)
+                score = -self.negamax(
+                    board, key ^ keys[move][stone], depth - 1, -beta, -alpha, 3 - stone, ply + 1
+                )
+                if tracker is not None:
+                    tracker.remove(move, stone)
+            board.remove(move)
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= alpha_orig:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        score = best_score
+        if score >= won:
+            score += ply
+        elif score <= -won:
+            score -= ply
+        self.table.put(key, depth, score, bound, best_move)
+        return best_score
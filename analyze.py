@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ai import AlphaBetaPlayer
+from book import DEFAULT_MAX_EMPTY, WIN_SCORE, SolutionCache
+from board import mask_cells
+from game import Game, X, O, DRAW
+
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_DEPTH = 2
+# transposition table slots of the fallback search of one position
+SEARCH_TABLE_SIZE = 1 << 14
+STONES = {"x": X, "o": O, ".": 0, "-": 0, "_": 0}
+RESULT_NAMES = {X: "X", O: "O", DRAW: "draw"}
+
+# per worker process: (rows, cols, k, max_empty) -> SolutionCache
+solvers = {}
+
+
+def parse_position(line):
+    """
+    Parses a position line: "ROWS K CELLS" or "ROWS COLS K CELLS", CELLS
+    being the board row by row in X, O and "." (or "-" / "_" for empty),
+    e.g. "3 3 XO..X...O".
+
+    Returns:
+    - Game: The position, with the player to move set from the stone counts.
+    """
+    fields = line.split()
+    if len(fields) == 3:
+        rows, k, cells = int(fields[0]), int(fields[1]), fields[2]
+        cols = len(cells) // rows if rows > 0 else 0
+    elif len(fields) == 4:
+        rows, cols, k, cells = int(fields[0]), int(fields[1]), int(fields[2]), fields[3]
+    else:
+        raise ValueError("expected ROWS K CELLS or ROWS COLS K CELLS")
+    if rows < 1 or cols < 1 or k < 1:
+        raise ValueError("rows, columns and k must be at least 1")
+    if len(cells) != rows * cols:
+        raise ValueError(f"{len(cells)} cells do not fill a {rows}x{cols} board")
+    game = Game(rows, cols, k)
+    board = game.board
+    for index, char in enumerate(cells.lower()):
+        stone = STONES.get(char)
+        if stone is None:
+            raise ValueError(f"unknown cell {char!r}")
+        if stone:
+            board.place(index, stone)
+            game.moves.append(index)
+    x, o = board.bits[X].bit_count(), board.bits[O].bit_count()
+    if x - o not in (0, 1):
+        raise ValueError(f"{x} X and {o} O stones cannot occur in a game")
+    game.to_move = X if x == o else O
+    return game
+
+
+def completed_lines(board, stone):
+    """
+    Returns the cells of every completed window of a stone, the cells
+    check_winner would highlight.
+    """
+    bits = board.bits[stone]
+    line = 0
+    for mask in board.masks:
+        if bits & mask == mask:
+            line |= mask
+    return mask_cells(line)
+
+
+def analyze(game, max_empty=DEFAULT_MAX_EMPTY, depth=DEFAULT_DEPTH):
+    """
+    Evaluates a position.
+
+    Positions with at most max_empty empty cells are solved exactly; for
+    larger ones the best move comes from a fixed-depth search and the value
+    stays unknown.
+
+    Parameters:
+    - game (Game): The position, e.g. from parse_position.
+    - max_empty (int): Solve positions with at most this many empty cells.
+    - depth (int): The search depth for positions too large to solve.
+
+    Returns:
+    - dict: to_move, winner ("X", "O", "draw" or None), winning_line (the
+      [row, col] cells), best ([row, col] or None), value ("win", "draw" or
+      "loss" for the player to move, or None) and plies to the end.
+    """
+    board = game.board
+    result = {"to_move": RESULT_NAMES[game.to_move], "winner": None, "winning_line": [], "best": None, "value": None}
+    x_line, o_line = completed_lines(board, X), completed_lines(board, O)
+    if x_line and o_line:
+        raise ValueError("both players have a line")
+    if x_line or o_line:
+        result["winner"] = "X" if x_line else "O"
+        result["winning_line"] = [list(board.coordinates(i)) for i in x_line or o_line]
+        return result
+    if board.is_full():
+        result["winner"] = "draw"
+        return result
+
+    size = (board.rows, board.cols, board.k, max_empty)
+    solver = solvers.get(size)
+    if solver is None:
+        solver = solvers[size] = SolutionCache(board.rows, board.cols, board.k, max_empty=max_empty)
+    solved = solver.lookup(board)
+    if solved is not None:
+        score, move = solved
+        result["value"] = "win" if score > 0 else "loss" if score < 0 else "draw"
+        result["plies"] = WIN_SCORE - abs(score) if score else board.size - board.occupied.bit_count()
+    else:
+        # a fresh table per position, so results do not depend on what the
+        # worker analyzed before (Zobrist keys only depend on the cell count)
+        searcher = AlphaBetaPlayer(time_budget=None, max_depth=depth, table_size=SEARCH_TABLE_SIZE)
+        move = searcher.choose_move(game)
+    if move is not None:
+        result["best"] = list(board.coordinates(move))
+    return result
+
+
+def analyze_chunk(task):
+    """
+    Analyzes a chunk of position lines in a worker process.
+
+    Parameters:
+    - task (tuple): (number of the first line, lines, max_empty, depth).
+
+    Returns:
+    - str: One JSON result line per position.
+    """
+    first, lines, max_empty, depth = task
+    out = []
+    for number, line in enumerate(lines, first):
+        try:
+            result = analyze(parse_position(line), max_empty, depth)
+        except ValueError as e:
+            result = {"error": str(e)}
+        result = {"line_number": number, "position": line, **result}
+        out.append(json.dumps(result))
+    out.append("")
+    return "\n".join(out)
+
+
+def chunks(lines, chunk_size):
+    """
+    Groups the position lines of a stream, skipping blank and "#" lines.
+
+    Yields:
+    - tuple: (number of the first line, list of lines)
+    """
+    chunk = []
+    first = None
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if first is None:
+            first = number
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield first, chunk
+            chunk, first = [], None
+    if chunk:
+        yield first, chunk
+
+
+def run(lines, out, max_empty=DEFAULT_MAX_EMPTY, depth=DEFAULT_DEPTH, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Streams positions through a process pool and writes the results in
+    input order as each chunk completes.
+
+    At most two chunks per worker are read ahead, so memory stays bounded
+    however long the input is.
+
+    Parameters:
+    - lines (iterable): Position lines, e.g. an open file.
+    - out (file): Where the JSON result lines go.
+    - max_empty (int): Solve positions with at most this many empty cells.
+    - depth (int): The search depth for positions too large to solve.
+    - workers (int): Worker processes. Default is the number of CPUs; 0
+      analyzes in this process.
+    - chunk_size (int): Positions sent to a worker at once.
+
+    Returns:
+    - int: The number of positions analyzed.
+    """
+    tasks = ((first, chunk, max_empty, depth) for first, chunk in chunks(lines, chunk_size))
+    positions = 0
+    if workers == 0:
+        for task in tasks:
+            out.write(analyze_chunk(task))
+            positions += len(task[1])
+        return positions
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append((pool.submit(analyze_chunk, task), len(task[1])))
+            if len(pending) >= 2 * workers:
+                future, n = pending.popleft()
+                out.write(future.result())
+                positions += n
+        while pending:
+            future, n = pending.popleft()
+            out.write(future.result())
+            positions += n
+    return positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyze board positions (ROWS K CELLS per line, e.g. '3 3 XO..X...O') into JSON lines."
+    )
+    parser.add_argument("input", nargs="?", default="-", help="position file, or - for stdin")
+    parser.add_argument("--output", default="-", help="result file, or - for stdout")
+    parser.add_argument("--max-empty", type=int, default=DEFAULT_MAX_EMPTY, help="solve positions with at most this many empty cells; each one more costs several times as long")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="search depth for larger positions")
+    parser.add_argument("--workers", type=int, default=None, help="0 analyzes without a pool")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    target = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        positions = run(source, target, args.max_empty, args.depth, args.workers, args.chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f"{positions} positions analyzed", file=sys.stderr)
@@ -0,0 +1,295 @@
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from ai import AlphaBetaPlayer
+from board import Board
+from game import Game
+from instrument import percentile
+from move_parser import parser_for
+
+
+DEFAULT_MIN_TIME = 0.5
+DEFAULT_THRESHOLD = 0.10
+BOARDS = ((3, 3, 3), (5, 5, 4), (7, 7, 4))
+FILL_LEVELS = (0.0, 0.5, 0.9)
+# (rows, cols, k, depth, fill) of the fixed-depth search benchmarks
+SEARCHES = ((7, 7, 4, 3, 0.2), (9, 9, 5, 2, 0.2), (15, 15, 5, 2, 0.1))
+
+TEXT_INPUTS = (
+    "1 2",
+    "first row and second column",
+    "3 row and 1 column",
+    "middle",
+    "2nd row 3rd column please",
+)
+SPEECH_INPUTS = (
+    "put it in the first row and the third column",
+    "second row second column",
+    "row three column one",
+    "I want the middle",
+    "um third row and uh first column",
+)
+
+
+def measure(func, setup=None, min_time=DEFAULT_MIN_TIME):
+    """
+    Times single calls of func until min_time seconds have been spent.
+
+    Parameters:
+    - func (callable): The operation to time. It gets setup's result, if any.
+    - setup (callable): Prepares the arguments of one call; not timed.
+    - min_time (float): Seconds of timed calls to collect.
+
+    Returns:
+    - dict: ops_per_sec and p50/p95/p99 latencies in microseconds.
+    """
+    clock = time.perf_counter_ns
+    samples = []
+    spent = 0
+    budget = int(min_time * 1e9)
+    while spent < budget:
+        if setup is None:
+            start = clock()
+            func()
+        else:
+            args = setup()
+            start = clock()
+            func(*args)
+        elapsed = clock() - start
+        samples.append(elapsed)
+        spent += elapsed
+    samples.sort()
+    return {
+        "ops_per_sec": round(len(samples) / (spent / 1e9), 1),
+        "p50_us": round(percentile(samples, 0.50) / 1e3, 3),
+        "p95_us": round(percentile(samples, 0.95) / 1e3, 3),
+        "p99_us": round(percentile(samples, 0.99) / 1e3, 3),
+        "calls": len(samples),
+    }
+
+
+def filled_game(rows, cols, k, fill, rng):
+    """
+    Returns a running game with about fill of its cells randomly played.
+    """
+    while True:
+        game = Game(rows, cols, k)
+        target = int(fill * game.board.size)
+        while len(game.moves) < target and not game.is_over():
+            game.play(rng.choice(game.legal_moves()))
+        if not game.is_over():
+            return game
+
+
+## Benchmarks ##
+def bench_move(rows, cols, k, fill):
+    """
+    Applying a move and checking for a winner, i.e. what handle_click does
+    before drawing, at the given fill level.
+    """
+    rng = random.Random(0)
+    game = filled_game(rows, cols, k, fill, rng)
+    moves = game.legal_moves()
+
+    def setup():
+        # take back the previous timed move so the fill level stays put
+        if len(game.moves) > 0 and game.moves[-1] in moves:
+            game.undo()
+        return (rng.choice(moves),)
+
+    return game.play, setup
+
+
+def bench_winning_line(rows, cols, k):
+    """
+    Win test on a worst-case cell: every line through it holds k - 1 own
+    stones, so no window completes and every mask is checked.
+    """
+    board = Board(rows, cols, k)
+    center = board.index(rows // 2, cols // 2)
+    for mask in board.cell_masks[center]:
+        board.bits[1] |= mask
+    # break each window exactly once so nothing wins
+    for mask in board.cell_masks[center]:
+        cells = [i for i in range(board.size) if mask >> i & 1 and i != center]
+        board.bits[1] &= ~(1 << cells[0])
+        board.bits[2] |= 1 << cells[0]
+    return (lambda: board.winning_line(center)), None
+
+
+def bench_random_game(rows, cols, k):
+    """
+    A full game of random moves from an empty board.
+    """
+    rng = random.Random(0)
+
+    def play():
+        game = Game(rows, cols, k)
+        while not game.is_over():
+            moves = game.legal_moves()
+            game.play(moves[rng.randrange(len(moves))])
+
+    return play, None
+
+
+def bench_parse(inputs, rows):
+    """
+    Parsing move commands as typed or as transcribed from speech.
+    """
+    parser = parser_for(rows, rows)
+    cycle = itertools.cycle(inputs)
+    return (lambda: parser.parse(next(cycle))), None
+
+
+def bench_search(rows, cols, k, depth, fill, pruning):
+    """
+    A fixed-depth alpha-beta search from a mid-game position, generating
+    either every empty cell or the threat tracker's candidates.
+    """
+    game = filled_game(rows, cols, k, fill, random.Random(0))
+
+    def setup():
+        # a fresh player each call so the transposition table starts empty
+        return (AlphaBetaPlayer(time_budget=None, max_depth=depth, pruning=pruning),)
+
+    return (lambda player: player.choose_move(game)), setup
+
+
+def node_counts():
+    """
+    Compares the nodes searched with and without threat-based pruning.
+
+    Returns:
+    - list: (board, depth, naive nodes, pruned nodes) per search.
+    """
+    counts = []
+    for rows, cols, k, depth, fill in SEARCHES:
+        game = filled_game(rows, cols, k, fill, random.Random(0))
+        nodes = []
+        for pruning in (False, True):
+            player = AlphaBetaPlayer(time_budget=None, max_depth=depth, pruning=pruning)
+            player.choose_move(game)
+            nodes.append(player.nodes)
+        counts.append((f"{rows}x{cols}:{k}", depth, *nodes))
+    return counts
+
+
+def benchmarks():
+    """
+    Returns every benchmark as (name, factory) pairs.
+    """
+    suite = []
+    for rows, cols, k in BOARDS:
+        size = f"{rows}x{cols}"
+        for fill in FILL_LEVELS:
+            suite.append(
+                (f"move/{size}/fill{int(fill * 100)}", lambda r=rows, c=cols, k=k, f=fill: bench_move(r, c, k, f))
+            )
+        suite.append((f"winning_line/{size}/worst", lambda r=rows, c=cols, k=k: bench_winning_line(r, c, k)))
+        suite.append((f"random_game/{size}", lambda r=rows, c=cols, k=k: bench_random_game(r, c, k)))
+    for rows, cols, k, depth, fill in SEARCHES:
+        for pruning, label in ((False, "naive"), (True, "threats")):
+            suite.append(
+                (
+                    f"search/{rows}x{cols}/depth{depth}/{label}",
+                    lambda r=rows, c=cols, k=k, d=depth, f=fill, p=pruning: bench_search(r, c, k, d, f, p),
+                )
+            )
+    suite.append(("parse/text", lambda: bench_parse(TEXT_INPUTS, 3)))
+    suite.append(("parse/speech", lambda: bench_parse(SPEECH_INPUTS, 3)))
+    return suite
+
+
+def run(pattern="", min_time=DEFAULT_MIN_TIME):
+    """
+    Runs every benchmark whose name contains pattern.
+
+    Returns:
+    - dict: {name: result of measure}
+    """
+    results = {}
+    for name, factory in benchmarks():
+        if pattern not in name:
+            continue
+        func, setup = factory()
+        results[name] = measure(func, setup, min_time)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Finds benchmarks that got slower than the baseline.
+
+    Parameters:
+    - results (dict): The current results from run.
+    - baseline (dict): Results loaded from a saved baseline.
+    - threshold (float): The allowed relative drop in ops/sec.
+
+    Returns:
+    - list: (name, baseline ops/sec, current ops/sec) of every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        if "ops_per_sec" not in result or "ops_per_sec" not in before:
+            continue
+        if result["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append((name, before["ops_per_sec"], result["ops_per_sec"]))
+    return regressions
+
+
+def format_results(results):
+    """
+    Returns the results as an aligned text table.
+    """
+    width = max(len(name) for name in results) + 2
+    lines = [
+        f"{'benchmark':<{width}}{'ops/sec':>14}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}"
+    ]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<{width}}{result['ops_per_sec']:>14,.0f}"
+            f"{result['p50_us']:>10.2f}{result['p95_us']:>10.2f}{result['p99_us']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the game hot paths.")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="seconds per benchmark")
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="flag regressions against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed ops/sec drop")
+    parser.add_argument("--nodes", action="store_true", help="compare search node counts and exit")
+    args = parser.parse_args()
+
+    if args.nodes:
+        print(f"{'board':<10}{'depth':>6}{'naive':>10}{'threats':>10}{'ratio':>8}")
+        for board, depth, naive, pruned in node_counts():
+            print(f"{board:<10}{depth:>6}{naive:>10}{pruned:>10}{naive / pruned:>7.1f}x")
+        sys.exit(0)
+
+    results = run(args.filter, args.min_time)
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "machine": platform.machine(), "benchmarks": results},
+                f,
+                indent=2,
+            )
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:,.0f} -> {after:,.0f} ops/sec")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}.")
@@ -0,0 +1,224 @@
+from functools import lru_cache
+
+
+# the four line directions through a cell: row, column, diagonal, anti-diagonal
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def default_win_length(rows, cols=None):
+    """
+    Returns the default number of consecutive stones needed to win.
+
+    Parameters:
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board. Default is rows.
+
+    Returns:
+    - int: 3 for boards up to 4x4, 4 up to 7x7 and 5 (gomoku) for larger boards.
+    """
+    size = max(rows, cols or rows)
+    if size <= 4:
+        return 3
+    if size <= 7:
+        return 4
+    return 5
+
+
+@lru_cache(maxsize=None)
+def win_masks(rows, cols, k):
+    """
+    Precomputes every k-in-a-row window on the board as a bitmask.
+
+    Bit i of a mask stands for the cell with flat index i = row * cols + col.
+
+    Parameters:
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board.
+    - k (int): The number of consecutive stones needed to win.
+
+    Returns:
+    - tuple: (masks, cell_masks) where masks holds every window once and
+      cell_masks holds, for each cell index, the windows running through it.
+    """
+    masks = []
+    cell_masks = [[] for _ in range(rows * cols)]
+    for row in range(rows):
+        for col in range(cols):
+            for d_row, d_col in DIRECTIONS:
+                end_row = row + (k - 1) * d_row
+                end_col = col + (k - 1) * d_col
+                if not (0 <= end_row < rows and 0 <= end_col < cols):
+                    continue
+                cells = [(row + i * d_row) * cols + col + i * d_col for i in range(k)]
+                mask = 0
+                for cell in cells:
+                    mask |= 1 << cell
+                masks.append(mask)
+                for cell in cells:
+                    cell_masks[cell].append(mask)
+    return tuple(masks), tuple(tuple(m) for m in cell_masks)
+
+
+def mask_cells(mask):
+    """
+    Returns the flat cell indexes of the bits set in the given mask.
+    """
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+class Board:
+    """
+    An N x M board where a player wins with k stones in a row.
+
+    The state is one Python int bitboard per player, bit i standing for the
+    cell with flat index i = row * cols + col. Stones are 1 for X and 2 for O.
+    """
+
+    def __init__(self, rows=3, cols=None, k=None):
+        """
+        Initializes an empty board.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board. Default is rows.
+        - k (int): The number of consecutive stones needed to win. Default is
+          default_win_length(rows, cols).
+        """
+        self.rows = rows
+        self.cols = cols or rows
+        self.k = k or default_win_length(self.rows, self.cols)
+        if self.k > max(self.rows, self.cols):
+            raise ValueError(
+                f"k={self.k} does not fit on a {self.rows}x{self.cols} board."
+            )
+        self.size = self.rows * self.cols
+        self.full_mask = (1 << self.size) - 1
+        # bits[1] for X, bits[2] for O; bits[0] is unused so stones index directly
+        self.bits = [0, 0, 0]
+        self.masks, self.cell_masks = win_masks(self.rows, self.cols, self.k)
+
+    def copy(self):
+        """
+        Returns an independent copy of the board sharing the cached win masks.
+        """
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board.bits = list(self.bits)
+        return board
+
+    def index(self, row, col):
+        """
+        Returns the flat cell index of the given row and column.
+        """
+        return row * self.cols + col
+
+    def coordinates(self, index):
+        """
+        Returns the (row, col) of the given flat cell index.
+        """
+        return divmod(index, self.cols)
+
+    def stone_at(self, index):
+        """
+        Returns the stone at the given flat cell index (0 if empty).
+        """
+        bit = 1 << index
+        if self.bits[1] & bit:
+            return 1
+        if self.bits[2] & bit:
+            return 2
+        return 0
+
+    def get(self, row, col):
+        """
+        Returns the stone at the given row and column (0 if empty).
+        """
+        return self.stone_at(row * self.cols + col)
+
+    @property
+    def occupied(self):
+        """
+        Returns the bitmask of all occupied cells.
+        """
+        return self.bits[1] | self.bits[2]
+
+    def is_full(self):
+        """
+        Returns True if no empty cells are left.
+        """
+        return self.bits[1] | self.bits[2] == self.full_mask
+
+    def legal_moves(self):
+        """
+        Returns the flat indexes of all empty cells in ascending order.
+        """
+        return mask_cells(~(self.bits[1] | self.bits[2]) & self.full_mask)
+
+    def place(self, index, stone):
+        """
+        Places a stone on an empty cell.
+
+        Parameters:
+        - index (int): The flat cell index.
+        - stone (int): 1 for X, 2 for O.
+        """
+        self.bits[stone] |= 1 << index
+
+    def remove(self, index):
+        """
+        Clears a previously placed stone.
+
+        Parameters:
+        - index (int): The flat cell index.
+        """
+        bit = ~(1 << index)
+        self.bits[1] &= bit
+        self.bits[2] &= bit
+
+    def is_win(self, index):
+        """
+        Returns True if the stone at the given index completes k in a row.
+        """
+        bits = self.bits[self.stone_at(index)]
+        for mask in self.cell_masks[index]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def winning_line(self, index):
+        """
+        Checks the windows through the stone at the given index for k in a row.
+
+        Parameters:
+        - index (int): The flat cell index of the last move.
+
+        Returns:
+        - list: The sorted cell indexes of every completed window through the
+          cell, or an empty list.
+        """
+        bits = self.bits[self.stone_at(index)]
+        line = 0
+        for mask in self.cell_masks[index]:
+            if bits & mask == mask:
+                line |= mask
+        return mask_cells(line)
+
+    def winner(self):
+        """
+        Scans the whole board for a completed window.
+
+        Returns:
+        - tuple: (stone, cell indexes) of the first completed window, or
+          (0, []) if nobody has k in a row.
+        """
+        for stone in (1, 2):
+            bits = self.bits[stone]
+            for mask in self.masks:
+                if bits & mask == mask:
+                    return stone, mask_cells(mask)
+        return 0, []
@@ -0,0 +1,383 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from functools import lru_cache
+from board import Board, mask_cells
+
+
+# score of a win on the next ply; every further ply costs one point
+WIN_SCORE = 100
+# boards with at most this many cells get a full on-disk tablebase
+TABLEBASE_MAX_CELLS = 12
+# 5x5 and up: solve exactly once at most this many cells are empty
+DEFAULT_MAX_EMPTY = 10
+DEFAULT_MAX_ENTRIES = 1 << 20
+
+BOOK_MAGIC = b"TTTB"
+BOOK_HEADER = struct.Struct("<4sBBBB")
+# 2: every reachable position is stored (version 1 missed some)
+BOOK_VERSION = 2
+ENTRY = struct.Struct("<H")
+
+
+def default_cache_dir():
+    """
+    Returns the directory holding tablebase files.
+
+    TICTACTOE_CACHE_DIR overrides the default ~/.cache/interactive-tictactoe.
+    """
+    return os.environ.get(
+        "TICTACTOE_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "interactive-tictactoe"),
+    )
+
+
+class SolveTimeout(Exception):
+    """
+    Raised inside the solver when its deadline has passed.
+    """
+
+
+@lru_cache(maxsize=None)
+def symmetries(rows, cols):
+    """
+    Returns the cell permutations of every board symmetry.
+
+    Square boards have 8 (rotations and reflections), rectangular boards 4.
+
+    Returns:
+    - tuple: One tuple per symmetry mapping each cell index to its image.
+    """
+    def permutation(transform):
+        return tuple(
+            transform(row, col)[0] * cols + transform(row, col)[1]
+            for row in range(rows)
+            for col in range(cols)
+        )
+
+    r, c = rows - 1, cols - 1
+    transforms = [
+        lambda i, j: (i, j),
+        lambda i, j: (i, c - j),
+        lambda i, j: (r - i, j),
+        lambda i, j: (r - i, c - j),
+    ]
+    if rows == cols:
+        transforms += [
+            lambda i, j: (j, i),
+            lambda i, j: (j, r - i),
+            lambda i, j: (c - j, i),
+            lambda i, j: (c - j, r - i),
+        ]
+    return tuple(permutation(t) for t in transforms)
+
+
+def transform(bits, perm):
+    """
+    Applies a cell permutation to a bitboard.
+    """
+    result = 0
+    for cell in mask_cells(bits):
+        result |= 1 << perm[cell]
+    return result
+
+
+def canonical(x_bits, o_bits, perms):
+    """
+    Returns the canonical form of a position under the board symmetries.
+
+    Returns:
+    - tuple: ((x_bits, o_bits) of the smallest image, the permutation that
+      maps the position onto it).
+    """
+    best, best_perm = None, None
+    for perm in perms:
+        image = (transform(x_bits, perm), transform(o_bits, perm))
+        if best is None or image < best:
+            best, best_perm = image, perm
+    return best, best_perm
+
+
+class Solver:
+    """
+    Exact negamax solver memoized on canonical positions.
+
+    Scores are from the side to move: WIN_SCORE - n for a win n plies away,
+    0 for a draw and negative for a loss.
+    """
+
+    def __init__(self, rows, cols, k, max_entries=None):
+        """
+        Initializes the solver.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        - k (int): The number of consecutive stones needed to win.
+        - max_entries (int): Clear the memo once it holds this many positions.
+          Default never clears.
+        """
+        self.board = Board(rows, cols, k)
+        self.perms = symmetries(self.board.rows, self.board.cols)
+        self.max_entries = max_entries
+        self.memo = {}
+        # perf_counter() time after which a solve gives up, or None
+        self.deadline = None
+        self.nodes = 0
+
+    def solve(self, x_bits, o_bits):
+        """
+        Solves a position where nobody has won yet.
+
+        Returns:
+        - tuple: (score, best move) in the frame of the given position. The
+          move is None if the board is full.
+        """
+        key, perm = canonical(x_bits, o_bits, self.perms)
+        if key not in self.memo:
+            if self.max_entries and len(self.memo) >= self.max_entries:
+                self.memo.clear()
+            self.memo[key] = self.search(*key)
+        score, move = self.memo[key]
+        if move is None:
+            return score, None
+        return score, perm.index(move)
+
+    def search(self, x_bits, o_bits):
+        """
+        Searches every move of a canonical position.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            # only finished positions are in the memo, so it stays valid
+            raise SolveTimeout()
+        board = self.board
+        board.bits = [0, x_bits, o_bits]
+        moves = board.legal_moves()
+        if not moves:
+            return 0, None
+        stone = 1 if x_bits.bit_count() == o_bits.bit_count() else 2
+        best_score, best_move = -WIN_SCORE - 1, None
+        for move in moves:
+            board.bits = [0, x_bits, o_bits]
+            board.place(move, stone)
+            if board.is_win(move):
+                score = WIN_SCORE - 1
+            else:
+                child = self.solve(board.bits[1], board.bits[2])[0]
+                # one ply further away than the child's result
+                score = -child + 1 if child > 0 else -child - 1 if child < 0 else 0
+            if score > best_score:
+                best_score, best_move = score, move
+                if score == WIN_SCORE - 1:
+                    break
+        return best_score, best_move
+
+
+class Tablebase:
+    """
+    Perfect-play answers for every reachable position on a small board.
+
+    The file holds one 16-bit entry per base-3 position code, so a lookup is
+    a single read from the memory-mapped file. The file is built on first use
+    and only mapped when the first query arrives.
+    """
+
+    def __init__(self, rows, cols, k, path=None):
+        """
+        Initializes the tablebase without touching the disk.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        - k (int): The number of consecutive stones needed to win.
+        - path (str): The tablebase file. Default lives in default_cache_dir().
+        """
+        self.rows, self.cols, self.k = rows, cols, k
+        self.path = path or os.path.join(
+            default_cache_dir(), f"book_{rows}x{cols}_k{k}_v{BOOK_VERSION}.bin"
+        )
+        self.powers = tuple(3 ** i for i in range(rows * cols))
+        self.map = None
+
+    def open(self):
+        """
+        Memory-maps the tablebase file, building it first if needed.
+        """
+        if not os.path.exists(self.path):
+            self.build()
+        with open(self.path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, k = BOOK_HEADER.unpack_from(self.map)
+        if (magic, version, rows, cols, k) != (
+            BOOK_MAGIC, BOOK_VERSION, self.rows, self.cols, self.k
+        ):
+            raise ValueError(f"{self.path} is not a tablebase for this board.")
+
+    def build(self):
+        """
+        Solves every reachable position and writes the tablebase file.
+        """
+        solver = Solver(self.rows, self.cols, self.k)
+        # the solver stops at the first winning move it finds, so positions
+        # only reachable through the other moves are solved one by one
+        board = Board(self.rows, self.cols, self.k)
+        seen = set()
+        stack = [(0, 0)]
+        while stack:
+            x_bits, o_bits = stack.pop()
+            key, _ = canonical(x_bits, o_bits, solver.perms)
+            if key in seen:
+                continue
+            seen.add(key)
+            solver.solve(*key)
+            x_bits, o_bits = key
+            stone = 1 if x_bits.bit_count() == o_bits.bit_count() else 2
+            board.bits = [0, x_bits, o_bits]
+            for move in board.legal_moves():
+                board.place(move, stone)
+                if not board.is_win(move) and not board.is_full():
+                    stack.append((board.bits[1], board.bits[2]))
+                board.remove(move)
+        table = bytearray(ENTRY.size * 3 ** (self.rows * self.cols))
+        for (x_bits, o_bits), (score, move) in solver.memo.items():
+            # store every symmetric image so lookups never canonicalize
+            for perm in solver.perms:
+                code = self.code(transform(x_bits, perm), transform(o_bits, perm))
+                ENTRY.pack_into(table, code * ENTRY.size, self.encode(score, perm, move))
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, self.rows, self.cols, self.k))
+            f.write(table)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def encode(score, perm, move):
+        """
+        Packs a result into 16 bits: move + 1 in bits 0-5, the result (1 win,
+        2 draw, 3 loss) in bits 6-7 and the plies to the end in bits 8-15.
+        """
+        result = 1 if score > 0 else 3 if score < 0 else 2
+        plies = WIN_SCORE - abs(score) if score else 0
+        move_bits = 0 if move is None else perm[move] + 1
+        return plies << 8 | result << 6 | move_bits
+
+    def code(self, x_bits, o_bits):
+        """
+        Returns the base-3 code of a position: the sum of stone * 3**index.
+        """
+        powers = self.powers
+        code = 0
+        for cell in mask_cells(x_bits):
+            code += powers[cell]
+        for cell in mask_cells(o_bits):
+            code += 2 * powers[cell]
+        return code
+
+    def lookup(self, board):
+        """
+        Looks up a position.
+
+        Returns:
+        - tuple: (result, plies, move) with result 1 for a win, 2 for a draw
+          and 3 for a loss of the side to move, or None if the position is
+          unreachable or already decided.
+        """
+        if self.map is None:
+            self.open()
+        offset = BOOK_HEADER.size + self.code(board.bits[1], board.bits[2]) * ENTRY.size
+        entry = ENTRY.unpack_from(self.map, offset)[0]
+        if not entry & 63:
+            return None
+        return entry >> 6 & 3, entry >> 8, (entry & 63) - 1
+
+    def best_move(self, game, deadline=None):
+        """
+        Returns the perfect-play move for the game, or None if unknown. A
+        lookup is a single read, so the deadline is not needed.
+        """
+        found = self.lookup(game.board)
+        return None if found is None else found[2]
+
+
+class SolutionCache:
+    """
+    Exact solutions for boards too large for a full tablebase.
+
+    Positions are solved once few enough cells are empty, and every solved
+    subtree stays in a bounded memo keyed by canonical position.
+    """
+
+    def __init__(self, rows, cols, k, max_empty=DEFAULT_MAX_EMPTY, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        - k (int): The number of consecutive stones needed to win.
+        - max_empty (int): Only solve positions with at most this many empty cells.
+        - max_entries (int): The memo is cleared when it grows beyond this size.
+        """
+        self.max_empty = max_empty
+        self.solver = Solver(rows, cols, k, max_entries=max_entries)
+
+    def lookup(self, board, deadline=None):
+        """
+        Solves a position if it is small enough.
+
+        Parameters:
+        - board (Board): The position.
+        - deadline (float): perf_counter() time to give up at. Default
+          solves to the end.
+
+        Returns:
+        - tuple: (score, move) as returned by Solver.solve, or None if too
+          many cells are empty, the game is already decided or the deadline
+          passed first.
+        """
+        if len(board.legal_moves()) > self.max_empty or board.winner()[0]:
+            return None
+        self.solver.deadline = deadline
+        try:
+            return self.solver.solve(board.bits[1], board.bits[2])
+        except SolveTimeout:
+            return None
+        finally:
+            self.solver.deadline = None
+
+    def best_move(self, game, deadline=None):
+        """
+        Returns the perfect-play move for the game, or None if unknown or
+        not solved by the deadline.
+        """
+        found = self.lookup(game.board, deadline)
+        return None if found is None else found[1]
+
+
+def open_book(rows, cols=None, k=None, max_empty=DEFAULT_MAX_EMPTY):
+    """
+    Returns the solution cache for a board without loading anything yet.
+
+    Parameters:
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board. Default is rows.
+    - k (int): The win length. Default depends on the board size.
+    - max_empty (int): The solve depth for boards without a tablebase.
+
+    Returns:
+    - Tablebase or SolutionCache: An object answering best_move(game).
+    """
+    board = Board(rows, cols, k)
+    if board.size <= TABLEBASE_MAX_CELLS:
+        return Tablebase(board.rows, board.cols, board.k)
+    return SolutionCache(board.rows, board.cols, board.k, max_empty=max_empty)
+
+
+if __name__ == "__main__":
+    # prebuild a tablebase, e.g. "python book.py 3 3 3"
+    Tablebase(*(int(arg) for arg in sys.argv[1:4])).open()
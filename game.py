@@ -0,0 +1,233 @@
+from board import Board
+
+
+# stones and results shared by the headless core and its front-ends
+X = 1
+O = 2
+DRAW = 3
+
+
+class GameObserver:
+    """
+    Receives game events from a Game.
+
+    Front-ends (the Tk window, recorders, broadcasters, ...) subclass this and
+    override only the events they care about.
+    """
+
+    def on_move(self, game, index, stone):
+        """
+        Called after a stone has been placed.
+
+        Parameters:
+        - game (Game): The game that changed.
+        - index (int): The flat cell index of the move.
+        - stone (int): X or O.
+        """
+
+    def on_undo(self, game, index, stone):
+        """
+        Called after a move has been taken back.
+
+        Parameters:
+        - game (Game): The game that changed.
+        - index (int): The flat cell index that was cleared.
+        - stone (int): The stone that was removed.
+        """
+
+    def on_game_over(self, game):
+        """
+        Called once a move ends the game. game.winner and game.winning_line
+        hold the result.
+        """
+
+    def on_reset(self, game):
+        """
+        Called after the game has been reset for a rematch.
+        """
+
+
+class Game:
+    """
+    The rules of k-in-a-row on an N x M board without any UI.
+
+    Attributes:
+    - board (Board): The bitboard state.
+    - to_move (int): The stone to play next, X or O.
+    - winner (int): None while the game is running, then X, O or DRAW.
+    - winning_line (list): The flat cell indexes of the winning stones.
+    - moves (list): The flat cell indexes played so far, in order.
+    - redo_moves (list): Undone moves, the next one to redo last.
+    """
+
+    def __init__(self, rows=3, cols=None, k=None):
+        """
+        Initializes a new game.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board. Default is rows.
+        - k (int): The number of consecutive stones needed to win. Default
+          depends on the board size (see board.default_win_length).
+        """
+        self.observers = []
+        self.new_board(rows, cols, k)
+
+    def new_board(self, rows, cols, k):
+        """
+        Clears the game state onto a fresh board.
+        """
+        self.board = Board(rows, cols, k)
+        self.to_move = X
+        self.winner = None
+        self.winning_line = []
+        self.moves = []
+        self.redo_moves = []
+
+    def copy(self):
+        """
+        Returns a snapshot of the game state without any observers, for
+        searches that run on another thread.
+        """
+        game = Game.__new__(Game)
+        game.observers = []
+        game.board = self.board.copy()
+        game.to_move = self.to_move
+        game.winner = self.winner
+        game.winning_line = list(self.winning_line)
+        game.moves = list(self.moves)
+        game.redo_moves = list(self.redo_moves)
+        return game
+
+    ## Observers ##
+    def add_observer(self, observer):
+        """
+        Registers a GameObserver for game events.
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Unregisters a GameObserver.
+        """
+        self.observers.remove(observer)
+
+    ## State ##
+    def is_over(self):
+        """
+        Returns True once somebody has won or the board is full.
+        """
+        return self.winner is not None
+
+    def is_legal(self, index):
+        """
+        Returns True if the given cell can be played now.
+        """
+        return (
+            self.winner is None
+            and 0 <= index < self.board.size
+            and not self.board.occupied >> index & 1
+        )
+
+    def legal_moves(self):
+        """
+        Returns the flat indexes of all playable cells.
+        """
+        return [] if self.winner is not None else self.board.legal_moves()
+
+    ## Moves ##
+    def play(self, index):
+        """
+        Places the stone to move on the given cell.
+
+        Parameters:
+        - index (int): The flat cell index.
+
+        Returns:
+        - bool: True if the move was applied, False if it was illegal.
+        """
+        if not self.is_legal(index):
+            return False
+        # replaying the undone move keeps the rest of the redo history
+        if self.redo_moves and self.redo_moves[-1] == index:
+            self.redo_moves.pop()
+        else:
+            self.redo_moves.clear()
+        stone = self.to_move
+        self.board.place(index, stone)
+        self.moves.append(index)
+        if self.board.is_win(index):
+            self.winner = stone
+            self.winning_line = self.board.winning_line(index)
+        elif self.board.is_full():
+            self.winner = DRAW
+        self.to_move = O if stone == X else X
+
+        for observer in self.observers:
+            observer.on_move(self, index, stone)
+        if self.winner is not None:
+            for observer in self.observers:
+                observer.on_game_over(self)
+        return True
+
+    def play_at(self, row, col):
+        """
+        Places the stone to move on the given row and column.
+
+        Returns:
+        - bool: True if the move was applied, False if it was illegal.
+        """
+        if not (0 <= row < self.board.rows and 0 <= col < self.board.cols):
+            return False
+        return self.play(self.board.index(row, col))
+
+    def undo(self):
+        """
+        Takes back the last move, restoring the player to move and clearing
+        the result. The move can be replayed with redo.
+
+        Returns:
+        - int: The flat cell index that was cleared, or None if no moves remain.
+        """
+        if not self.moves:
+            return None
+        index = self.moves.pop()
+        stone = O if self.to_move == X else X
+        self.board.remove(index)
+        self.redo_moves.append(index)
+        self.to_move = stone
+        self.winner = None
+        self.winning_line = []
+
+        for observer in self.observers:
+            observer.on_undo(self, index, stone)
+        return index
+
+    def redo(self):
+        """
+        Replays the last undone move.
+
+        Returns:
+        - int: The flat cell index that was played, or None if nothing was undone.
+        """
+        if not self.redo_moves:
+            return None
+        index = self.redo_moves[-1]
+        self.play(index)
+        return index
+
+    def reset(self, rows=None, cols=None, k=None):
+        """
+        Starts a new game, optionally on a different board.
+
+        Parameters:
+        - rows (int): The number of rows. Default keeps the current size.
+        - cols (int): The number of columns. Default is rows.
+        - k (int): The win length. Default depends on the board size.
+        """
+        if rows is None:
+            rows, cols, k = self.board.rows, self.board.cols, self.board.k
+        self.new_board(rows, cols, k)
+
+        for observer in self.observers:
+            observer.on_reset(self)
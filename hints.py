@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from ai import rollout
+
+
+# seconds between two updates pushed to the window
+HINT_INTERVAL = 0.25
+# the analysis of a position stops after this many playouts
+HINT_MAX_PLAYOUTS = 20000
+# at most this many cells are analyzed
+HINT_MAX_CANDIDATES = 24
+
+
+class HintWorker:
+    """
+    Monte Carlo analysis of the position for the player to move, run on a
+    background thread.
+
+    Every candidate cell gets random playouts in turns, so the estimates
+    sharpen over time. They are handed to publish every interval seconds
+    and once more at the end. Starting a new analysis cancels the previous
+    one, which stops after its current playout.
+    """
+
+    def __init__(self, publish, interval=HINT_INTERVAL, max_playouts=HINT_MAX_PLAYOUTS, seed=None):
+        """
+        Parameters:
+        - publish (callable): Called from the worker thread with
+          (generation, stats, playouts), stats being {cell: (win rate,
+          draw rate, playouts)} for the player to move.
+        - interval (float): Seconds between two publish calls.
+        - max_playouts (int): Playouts after which the analysis stops.
+        - seed (int): The random seed.
+        """
+        self.publish = publish
+        self.interval = interval
+        self.max_playouts = max_playouts
+        self.rng = random.Random(seed)
+        self.cancelled = None
+
+    def start(self, game, candidates, generation):
+        """
+        Cancels the running analysis and starts one for a game.
+
+        Parameters:
+        - game (Game): A snapshot of the position; it is not modified.
+        - candidates (list): The cells to analyze.
+        - generation (int): Passed back to publish to tell stale results apart.
+        """
+        self.cancel()
+        if not candidates:
+            return
+        self.cancelled = threading.Event()
+        threading.Thread(
+            target=self.run,
+            args=(game, candidates, generation, self.cancelled, random.Random(self.rng.random())),
+            daemon=True,
+        ).start()
+
+    def cancel(self):
+        """
+        Stops the running analysis, if any.
+        """
+        if self.cancelled is not None:
+            self.cancelled.set()
+            self.cancelled = None
+
+    def run(self, game, candidates, generation, cancelled, rng):
+        stone = game.to_move
+        # cell -> [wins, draws, playouts]
+        counts = {cell: [0, 0, 0] for cell in candidates}
+        playouts = 0
+        published = time.perf_counter()
+        while playouts < self.max_playouts:
+            for cell in candidates:
+                if cancelled.is_set():
+                    return
+                board = game.board.copy()
+                board.place(cell, stone)
+                if board.is_win(cell):
+                    winner = stone
+                elif board.is_full():
+                    winner = 0
+                else:
+                    winner = rollout(board, 3 - stone, rng)
+                entry = counts[cell]
+                entry[0] += winner == stone
+                entry[1] += winner == 0
+                entry[2] += 1
+            playouts += len(candidates)
+            if time.perf_counter() - published >= self.interval:
+                self.publish(generation, self.stats(counts), playouts)
+                published = time.perf_counter()
+        if not cancelled.is_set():
+            self.publish(generation, self.stats(counts), playouts)
+
+    @staticmethod
+    def stats(counts):
+        return {
+            cell: (wins / n, draws / n, n) for cell, (wins, draws, n) in counts.items() if n
+        }
+
+
+def shade(strength):
+    """
+    Returns the background color of an empty cell for a hint strength
+    between 0 (weakest candidate) and 1 (strongest).
+    """
+    strength = max(0.0, min(1.0, strength))
+    return "#{:02x}{:02x}{:02x}".format(0, int(40 + 110 * strength), int(60 + 140 * strength))
@@ -0,0 +1,233 @@
+import functools
+import math
+import threading
+import time
+from collections import Counter
+from game import GameObserver
+
+
+# histogram buckets: the first holds everything up to MIN_BUCKET seconds,
+# each next one is BUCKET_GROWTH times wider (about 19% resolution)
+MIN_BUCKET = 1e-6
+BUCKET_GROWTH = 2 ** 0.25
+BUCKETS = 128
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# entries listed by the profile reports
+PROFILE_TOP = 20
+
+
+class Histogram:
+    """
+    Latencies in logarithmic buckets: constant memory and constant time per
+    sample, with percentiles accurate to one bucket.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds <= MIN_BUCKET:
+            self.buckets[0] += 1
+        else:
+            index = int(math.log(seconds / MIN_BUCKET, BUCKET_GROWTH)) + 1
+            self.buckets[min(index, BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding the given percentile,
+        in seconds.
+        """
+        target = fraction * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(MIN_BUCKET * BUCKET_GROWTH ** index, self.max)
+        return self.max
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of sorted samples (nearest rank).
+    """
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+class Metrics(GameObserver):
+    """
+    Histograms of how long the hot paths take and counters of game events.
+
+    Functions are timed by replacing them with timed wrappers, so nothing
+    is measured, and nothing costs anything, unless instrumentation is on.
+    Attach it to a Game as an observer to count moves, undos and games.
+    Samples may come from any thread.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    ## Recording ##
+    def observe(self, name, seconds):
+        """
+        Adds a latency sample to the named histogram.
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def timed(self, name, func):
+        """
+        Returns func wrapped to record every call in the named histogram.
+        """
+        clock = time.perf_counter
+        observe = self.observe
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, clock() - started)
+
+        return wrapper
+
+    def instrument(self, obj, names, prefix=""):
+        """
+        Replaces the named methods of one object with timed wrappers.
+        Callbacks handed out before this keep calling the untimed method.
+
+        Parameters:
+        - obj (object): The instance whose methods to time.
+        - names (iterable): Method names; missing ones are skipped.
+        - prefix (str): Prepended to the histogram names.
+        """
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is not None:
+                setattr(obj, name, self.timed(prefix + name, method))
+
+    ## Game events ##
+    def on_move(self, game, index, stone):
+        self.count("moves")
+
+    def on_undo(self, game, index, stone):
+        self.count("undos")
+
+    def on_game_over(self, game):
+        self.count("games finished")
+
+    def on_reset(self, game):
+        self.count("boards")
+
+    ## Report ##
+    def report(self):
+        """
+        Returns the histograms and counters as text.
+        """
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        width = max([len(name) for name, _ in histograms + counters] + [10]) + 2
+        lines = ["Timings (ms):"]
+        lines.append(f"  {'':<{width}}{'calls':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'total':>10}")
+        for name, h in histograms:
+            lines.append(
+                f"  {name:<{width}}{h.count:8d}"
+                f"{h.percentile(0.50) * 1000:9.3f}{h.percentile(0.95) * 1000:9.3f}"
+                f"{h.percentile(0.99) * 1000:9.3f}{h.max * 1000:9.3f}{h.total * 1000:10.1f}"
+            )
+        lines.append("Counters:")
+        for name, n in counters:
+            lines.append(f"  {name:<{width}}{n:8d}")
+        return "\n".join(lines)
+
+
+class GameProfiler(GameObserver):
+    """
+    Runs cProfile or tracemalloc for exactly one game: from start until the
+    game ends, the board is reset or stop is called, whichever comes first.
+
+    cProfile only sees the thread that called start (the Tk thread), so
+    the computer player's search and speech recognition are not included;
+    tracemalloc counts allocations from every thread.
+    """
+
+    def __init__(self, mode):
+        """
+        Parameters:
+        - mode (str): "cprofile" or "tracemalloc".
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {', '.join(PROFILE_MODES)}.")
+        self.mode = mode
+        self.profile = None
+        self.running = False
+        self.done = False
+
+    def start(self):
+        if self.running or self.done:
+            return
+        if self.mode == "cprofile":
+            import cProfile
+
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            import tracemalloc
+
+            tracemalloc.start()
+        self.running = True
+
+    def stop(self):
+        """
+        Ends the capture and prints its report.
+        """
+        if not self.running:
+            return
+        self.running = False
+        self.done = True
+        if self.mode == "cprofile":
+            self.profile.disable()
+            import io
+            import pstats
+
+            out = io.StringIO()
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            print(f"Profile of one game:\n{out.getvalue()}")
+            self.profile = None
+        else:
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            lines = [f"Allocations of one game: {current / 1024:.1f} KiB live, {peak / 1024:.1f} KiB peak"]
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                lines.append(f"  {stat}")
+            print("\n".join(lines))
+
+    ## Game events ##
+    def on_game_over(self, game):
+        self.stop()
+
+    def on_reset(self, game):
+        self.stop()
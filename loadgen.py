@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from instrument import percentile
+from server import DEFAULT_HOST, DEFAULT_PORT, GameServer
+
+
+DEFAULT_CONNECTIONS = 50
+DEFAULT_GAMES = 40
+DEFAULT_ROUNDS = 3
+# share of moves sent as text for the server to parse
+DEFAULT_TEXT_SHARE = 0.25
+ORDINALS = ("first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth")
+
+
+async def request(reader, writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+    reply = json.loads(await reader.readline())
+    if not reply["ok"]:
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+def move_message(game_id, index, cols, rng, text_share):
+    row, col = divmod(index, cols)
+    if row < len(ORDINALS) and col < len(ORDINALS) and rng.random() < text_share:
+        return {"op": "move", "game": game_id, "text": f"{ORDINALS[row]} row {ORDINALS[col]} column"}
+    return {"op": "move", "game": game_id, "row": row, "col": col}
+
+
+async def client(host, port, games, rounds, rows, cols, k, text_share, seed, latencies):
+    """
+    Plays random games over one connection, keeping games open at once and
+    moving in each of them in turn.
+
+    Returns:
+    - tuple: (games finished, moves played)
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 16)
+    clock = time.perf_counter
+    finished = moves = 0
+    try:
+        for _ in range(rounds):
+            # game id -> shuffled cells still to try
+            open_games = {}
+            for _ in range(games):
+                reply = await request(reader, writer, {"op": "new", "rows": rows, "cols": cols, "k": k})
+                cells = list(range(rows * cols))
+                rng.shuffle(cells)
+                open_games[reply["game"]] = cells
+            while open_games:
+                for game_id in list(open_games):
+                    message = move_message(game_id, open_games[game_id].pop(), cols, rng, text_share)
+                    started = clock()
+                    reply = await request(reader, writer, message)
+                    latencies.append(clock() - started)
+                    moves += 1
+                    if reply["winner"] is not None:
+                        del open_games[game_id]
+                        await request(reader, writer, {"op": "close", "game": game_id})
+                        finished += 1
+    finally:
+        writer.close()
+    return finished, moves
+
+
+async def run_load(host, port, connections, games, rounds, rows, cols, k, text_share, seed=0):
+    """
+    Runs the clients concurrently against a server.
+
+    Returns:
+    - dict: Throughput and round-trip latency of the moves.
+    """
+    latencies = []
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            client(host, port, games, rounds, rows, cols, k, text_share, seed + i, latencies)
+            for i in range(connections)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    finished = sum(games for games, _ in results)
+    moves = sum(moves for _, moves in results)
+    samples = sorted(latencies)
+    return {
+        "concurrent_games": connections * games,
+        "games": finished,
+        "moves": moves,
+        "seconds": round(elapsed, 2),
+        "moves_per_sec": round(moves / elapsed),
+        "p50_us": round(percentile(samples, 0.50) * 1e6, 1),
+        "p95_us": round(percentile(samples, 0.95) * 1e6, 1),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 1),
+    }
+
+
+async def run_local(args):
+    """
+    Starts a server on a free port in this process and loads it.
+    """
+    server = GameServer()
+    ready = asyncio.get_running_loop().create_future()
+    serving = asyncio.ensure_future(server.serve(args.host, 0, ready.set_result))
+    port = await ready
+    try:
+        report = await run_load(
+            args.host, port, args.connections, args.games, args.rounds,
+            args.rows, args.cols, args.k, args.text_share, args.seed,
+        )
+        stats = server.stats()
+        report["server_p50_us"] = stats["p50_us"]
+        report["server_p99_us"] = stats["p99_us"]
+        return report
+    finally:
+        serving.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for server.py.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--local", action="store_true", help="start a server in this process")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="open games per connection")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="batches of games per connection")
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int)
+    parser.add_argument("--k", type=int)
+    parser.add_argument("--text-share", type=float, default=DEFAULT_TEXT_SHARE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    args.cols = args.cols or args.rows
+
+    if args.local:
+        report = asyncio.run(run_local(args))
+    else:
+        report = asyncio.run(
+            run_load(
+                args.host, args.port, args.connections, args.games, args.rounds,
+                args.rows, args.cols, args.k, args.text_share, args.seed,
+            )
+        )
+    for key, value in report.items():
+        print(f"{key:<18}{value}")
@@ -1,34 +1,175 @@
-import numpy as np
-import tkinter as tk
-from tkinter import messagebox
-from util import BoardInputTypeDialog, Player, Messages, PlaceholderEntry
-import speech_recognition as sr
-# need for first time run
-# import nltk
-# nltk.download('punkt')
-from nltk.tokenize import word_tokenize
-
-
-class TicTacToe:
+from startup import STARTUP
+
+# heavy optional modules (speech_recognition, the AI and its tablebase) are
+# imported where they are first needed, not here
+with STARTUP.phase("tkinter"):
+    import os
+    import threading
+    import tkinter as tk
+    from tkinter import messagebox
+with STARTUP.phase("game modules"):
+    from game import Game, GameObserver, X, O, DRAW
+    from util import BoardInputTypeDialog, Player, Messages, PlaceholderEntry
+    from move_parser import parser_for
+    from renderer import create_renderer
+
+# how often the Tk loop picks up moves recognized from speech
+SPEECH_POLL_MS = 50
+
+
+class TicTacToe(GameObserver):
     ## Inits ##
-    def __init__(self, title="Tic Tac Toe", rows=3, input_type=1):
+    def __init__(
+        self,
+        title="Tic Tac Toe",
+        rows=3,
+        cols=None,
+        k=None,
+        input_type=1,
+        opponent=1,
+        ai_time_budget=None,
+        speech_engine=None,
+        renderer=None,
+        record=None,
+        hints=None,
+        instrument=None,
+        profile=None,
+        spectate=None,
+        spectate_host=None,
+    ):
         """
         Initializes the Tic Tac Toe game.
 
         Parameters:
         - title (str): The title of the game window.
-        - rows (int): The number of rows and columns in the game board.
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board. Default is rows.
+        - k (int): The number of consecutive stones needed to win. Default
+          depends on the board size (see board.default_win_length).
         - input_type (int): The input type. 1 for text, 2 for speech.
+        - opponent (int): 1 for a human opponent, 2 for the computer playing O
+          with alpha-beta search, 3 for the computer using Monte Carlo tree
+          search.
+        - ai_time_budget (float): Seconds the computer may think per move.
+          Default is ai.DEFAULT_TIME_BUDGET.
+        - speech_engine (str): "google" or "vosk" (offline). Default is the
+          TICTACTOE_SPEECH_ENGINE environment variable, else "google".
+        - renderer (str): "buttons" or "canvas" (one widget for the whole
+          board, faster on large boards). Default is the TICTACTOE_RENDERER
+          environment variable, else "buttons".
+        - record (str): A game record file every game is appended to. Default
+          is the TICTACTOE_RECORD environment variable, else no recording.
+        - hints (bool): Shade the empty cells by their Monte Carlo strength
+          and show the win and draw chances of the player to move. Default
+          is the TICTACTOE_HINTS environment variable ("1" turns them on).
+          Ctrl+H toggles them while playing.
+        - instrument (bool): Time the move, redraw, parsing and speech paths
+          and count game events; the report is printed on exit and on
+          Ctrl+P. Default is the TICTACTOE_INSTRUMENT environment variable
+          ("1" turns it on).
+        - profile (str): "cprofile" or "tracemalloc" to profile the first
+          game. Default is the TICTACTOE_PROFILE environment variable, else
+          no profiling.
+        - spectate (int): Stream the game to spectators on this TCP port
+          (see spectate.py). Default is the TICTACTOE_SPECTATE environment
+          variable, else no spectators.
+        - spectate_host (str): The address spectators connect to, e.g.
+          "0.0.0.0" for every interface. Default is the
+          TICTACTOE_SPECTATE_HOST environment variable, else 127.0.0.1.
         """
 
         self.window = tk.Tk()
-        self.window.title(f"{title} {rows}x{rows}")
-        self.rows = rows
-        self.board = np.zeros((self.rows, self.rows), dtype=int)
+        self.title = title
+        # all rules live in the headless game, the window only observes it
+        self.game = Game(rows, cols, k)
+        self.game.add_observer(self)
+        self.rows = self.game.board.rows
+        self.cols = self.game.board.cols
+        self.window.title(f"{title} {self.rows}x{self.cols}")
+        self.metrics = None
+        if instrument is None:
+            instrument = os.environ.get("TICTACTOE_INSTRUMENT") == "1"
+        if instrument:
+            from instrument import Metrics
+
+            self.metrics = Metrics()
+            self.game.add_observer(self.metrics)
+            # before any callback is handed out, so the timed versions are
+            self.metrics.instrument(
+                self, ("handle_click", "config_button", "config_bground", "extract_coordinates", "extract_action")
+            )
+            self.metrics.instrument(self.game, ("play",), prefix="game.")
+            self.window.bind("<Control-p>", lambda event: print(self.metrics.report()))
+        self.profiler = None
+        profile = profile or os.environ.get("TICTACTOE_PROFILE")
+        if profile:
+            from instrument import GameProfiler
+
+            self.profiler = GameProfiler(profile)
+            self.game.add_observer(self.profiler)
+            self.profiler.start()
+        self.spectators = None
+        spectate = spectate or os.environ.get("TICTACTOE_SPECTATE")
+        if spectate:
+            from spectate import DEFAULT_HOST, SpectatorFeed, SpectatorServer
+
+            host = spectate_host or os.environ.get("TICTACTOE_SPECTATE_HOST") or DEFAULT_HOST
+            self.spectators = SpectatorServer(SpectatorFeed(self.game), host=host, port=int(spectate))
+            print(f"Spectators can watch on {host}:{self.spectators.port}.")
         self.input_type = input_type
-        self.current_player = Player.X
-        self.winner = None
+        self.ai_time_budget = ai_time_budget
+        self.ai = self.create_ai(opponent) if opponent != 1 else None
+        # numbers the computer's searches; only the latest one may play
+        self.ai_search = 0
+        self.speech_engine = speech_engine or os.environ.get("TICTACTOE_SPEECH_ENGINE", "google")
+        self.renderer_name = renderer or os.environ.get("TICTACTOE_RENDERER", "buttons")
+        self.recorder = None
+        record = record or os.environ.get("TICTACTOE_RECORD")
+        if record:
+            from record import GameLog, GameRecorder
+
+            # a few bytes per game; write each one at once so a crash loses nothing
+            self.recorder = GameRecorder(GameLog(record, flush_bytes=0))
+            self.game.add_observer(self.recorder)
+        self.renderer = None
+        self.entry = None
+        self.submit_button = None
+        self.history_buttons = []
+        # cells lit up by the last win, cleared again by undo
+        self.highlighted = []
+        self.window.bind("<Control-z>", lambda event: self.undo_move())
+        self.window.bind("<Control-h>", lambda event: self.toggle_hints())
+        self.hint_worker = None
+        self.hint_generation = 0
+        self.hint_pending = False
+        self.hinted = []
+        if hints is None:
+            hints = os.environ.get("TICTACTOE_HINTS") == "1"
+        if hints:
+            self.toggle_hints()
+        self.window.bind("<Control-y>", lambda event: self.redo_move())
         self.mic_is_on = False
+        # opened on the first switch to speech and kept until the app closes
+        self.audio_session = None
+        self.speech_poll = None
+
+    @property
+    def current_player(self):
+        """
+        The Player whose turn it is.
+        """
+        return Player.X if self.game.to_move == X else Player.O
+
+    @property
+    def winner(self):
+        """
+        The winning Player's value, Player.DRAW.value, or None while playing.
+        """
+        if self.game.winner is None:
+            return None
+        if self.game.winner == DRAW:
+            return Player.DRAW.value
+        return Player.X.value if self.game.winner == X else Player.O.value
 
     def init_input_type(self):
         """
@@ -36,23 +177,36 @@ class TicTacToe:
         """
         # text input
         if self.input_type == 1:
-            # turn of mic if it is on
+            # turn of mic if it is on; it stays open for a switch back to speech
             if self.mic_is_on:
-                self.listening(wait_for_stop=False)
+                self.audio_session.pause()
+                self.mic_is_on = False
             if self.winner is None and self.window.winfo_exists():
                 self.create_text_input(readonly=False)
 
         # speech input (https://github.com/Uberi/speech_recognition/blob/master/examples/background_listening.py)
         elif self.input_type == 2:
+            if self.audio_session is None:
+                with STARTUP.phase("speech_recognition (lazy)"):
+                    from speech import create_backend, AudioSession, SpeechPipeline
+                self.speech_backend = create_backend(self.speech_engine, self.rows, self.cols)
+                # recognition runs off the Tk thread; moves come back through a bounded queue
+                self.speech_pipeline = SpeechPipeline(
+                    self.speech_backend,
+                    self.extract_action,
+                    lambda: len(self.game.moves),
+                    metrics=self.metrics,
+                    parse_partial=self.extract_partial_action,
+                )
+                # calibrates in the background; streaming engines decode while the player is still speaking
+                self.audio_session = AudioSession(
+                    self.speech_backend, self.speech_pipeline, self.process_partial_speech
+                )
+            else:
+                self.audio_session.resume()
             self.mic_is_on = True
-            # obtain audio from the microphone
-            self.r = sr.Recognizer()
-            self.m = sr.Microphone()
-            # calibrate once
-            with self.m as source:
-                self.r.adjust_for_ambient_noise(source)
-            # start listening
-            self.listening = self.r.listen_in_background(self.m, self.process_speech)
+            if self.speech_poll is None:
+                self.poll_speech()
             if self.winner is None and self.window.winfo_exists():
                 self.create_text_input(readonly=True)
         else:
@@ -62,17 +216,25 @@ class TicTacToe:
 
     def init_board(self):
         """
-        Creates the game board with buttons using tkinter.
+        Creates the game board with the chosen renderer.
         """
-        for row in range(self.rows):
-            for col in range(self.rows):
-                self.create_button(row, col)
+        self.renderer = create_renderer(
+            self.renderer_name, self.window, self.rows, self.cols, self.handle_click
+        )
+        if self.metrics is not None:
+            # the canvas draws in flush; draw only marks cells dirty there
+            self.metrics.instrument(self.renderer, ("draw", "flush"), prefix="renderer.")
 
     ## Create ##
     def create_text_input(self, readonly):
         """
-        Creates an entry field and a submit button for text input.
+        Creates an entry field and a submit button for text input, replacing
+        the previous ones.
         """
+        for widget in [self.entry, self.submit_button] + self.history_buttons:
+            if widget is not None:
+                widget.destroy()
+        self.submit_button = None
         self.entry = PlaceholderEntry(
             self.window,
             placeholder=Messages.Player_TURN.value.format(self.current_player.value),
@@ -81,7 +243,7 @@ class TicTacToe:
         self.entry.grid(
             row=self.rows + 1,
             column=0,
-            columnspan=self.rows - 1,
+            columnspan=self.cols - 1,
             sticky="nsew",
         )
         if not readonly: 
@@ -94,60 +256,56 @@ class TicTacToe:
             cursor="hand2",
             font=("Times New Roman", 11, "bold"),
         )
-            self.submit_button.grid(row=self.rows + 1, column=self.rows - 1, sticky="nsew")
-
-    def create_button(self, row, col):
-        """
-        create the buttons for the game board.
-        """
-
-        button = tk.Button(
-            self.window,
-            text="",
-            font=("Times New Roman", 50),
-            height=2,
-            width=6,
-            bg="black",
-            command=lambda row=row, col=col: self.handle_click(row, col),
-        )
-        button.grid(row=row, column=col, sticky="news")
-
-        # buttons expand with window
-        tk.Grid.rowconfigure(self.window, row, weight=1)
-        tk.Grid.columnconfigure(self.window, col, weight=1)
+            self.submit_button.grid(row=self.rows + 1, column=self.cols - 1, sticky="nsew")
+
+        # undo and redo share the row below
+        half = self.cols // 2
+        self.history_buttons = []
+        for text, command, column, span in (
+            ("Undo", self.undo_move, 0, half),
+            ("Redo", self.redo_move, half, self.cols - half),
+        ):
+            button = tk.Button(
+                self.window,
+                text=text,
+                command=command,
+                cursor="hand2",
+                font=("Times New Roman", 11, "bold"),
+            )
+            button.grid(row=self.rows + 2, column=column, columnspan=span, sticky="nsew")
+            self.history_buttons.append(button)
 
     def recreate_board(self):
         """
         Resets the game board for a rematch.
         """
-        board_type, input_type = msg_box()
+        board_type, input_type, opponent = msg_box()
         if (
-            (board_type is None)
-            | (board_type == 0)
+            (type(board_type) is not tuple)
             | (input_type is None)
             | (input_type == 0)
         ):
             return
-        self.board = np.zeros((board_type, board_type), dtype=int)
-        self.current_player = Player.X
-        self.winner = None
-        # same board
-        if self.rows == board_type:
-            for row in range(self.rows):
-                for col in range(self.rows):
-                    self.config_button(row, col)
-        else:
-            self.rows = board_type
-            # remove all widgets
-            for widget in self.window.winfo_children():
-                widget.grid_forget()
-            # create new board
-            self.init_board()
+        rows, cols, k = board_type
+        # commands heard for the previous game must not land on the new board
+        if self.mic_is_on:
+            self.speech_pipeline.cancel()
+        self.game.reset(rows, cols, k)
+        self.ai = self.create_ai(opponent) if opponent != 1 else None
+        resized = (self.rows, self.cols) != (rows, cols)
+        self.renderer.reset(rows, cols)
+        if resized:
+            self.rows, self.cols = rows, cols
+            self.window.title(f"{self.title} {self.rows}x{self.cols}")
+            if self.audio_session is not None:
+                self.audio_session.set_board(rows, cols)
 
         # different input type
         if self.input_type != input_type:
             self.input_type = input_type
             self.init_input_type()
+        elif resized:
+            self.create_text_input(readonly=self.input_type == 2)
 
     ## Config ##
     def config_button(self, row, col, text="", color="black", background="black"):
@@ -160,8 +318,7 @@ class TicTacToe:
         - text (str): The text to display on the button. Default is an empty string.
         - color (str): The color of the text on the button. Default is "black".
         """
-        button = self.window.grid_slaves(row=row, column=col)[0]
-        button.config(text=text, fg=color, bg=background)
+        self.renderer.draw(row, col, text, color, background)
 
     def config_bground(self, coordinates):
         """
@@ -176,8 +333,9 @@ class TicTacToe:
         """
         for coord in coordinates:
             row, col = coord
-            text = Player.X.value if self.board[row, col] == 1 else Player.O.value
-            color = "red" if self.board[row, col] == 1 else "green"
+            stone = self.game.board.get(row, col)
+            text = Player.X.value if stone == X else Player.O.value
+            color = "red" if stone == X else "green"
             self.config_button(row, col, text=text, color=color, background="white")
 
     ## Handle ##
@@ -186,192 +344,297 @@ class TicTacToe:
         Handles a click event on a button at the given row and column.
 
         """
-        if self.winner is None and self.board[row, col] == 0:
-            self.board[row, col] = 1 if self.current_player == Player.X else 2
-            color = "red" if self.current_player == Player.X else "green"
-            self.config_button(row, col, text=self.current_player.value, color=color)
-            self.current_player = (
-                Player.O if self.current_player == Player.X else Player.X
-            )
-            self.check_winner()
-        # update the entry field
-        self.entry.update(Messages.Player_TURN.value.format(self.current_player.value))
-        print(Messages.Player_TURN.value.format(self.current_player.value))
+        # ignore the human while the computer is thinking
+        if not self.is_ai_turn():
+            self.game.play_at(row, col)
+        self.show_turn()
 
-    ## Check ##
-    def check_winner(self):
+    def undo_move(self):
         """
-        Checks for a winner or a tie in the game.
+        Takes back the last move. Against the computer, takes back its reply
+        as well so the human is to move again.
         """
-        # Check rows
-        for i, row in enumerate(self.board):
-            winner, coordinates = self.check_consecutive(
-                [(cell, (i, j)) for j, cell in enumerate(row)]
-            )
-            if winner:
-                self.config_bground(coordinates)
-                break
-
-        # Check columns
-        for j in range(self.rows):
-            column = [(self.board[i][j], (i, j)) for i in range(self.rows)]
-            winner, coordinates = self.check_consecutive(column)
-            if winner:
-                self.config_bground(coordinates)
-                break
-
-        # Check diagonals
-        if self.rows == 3:
-            self.check_3x3_diagonals()
-        elif self.rows == 5:
-            self.check_5x5_diagonals()
-        else:
-            self.check_7x7_diagonals()
+        if self.game.undo() is None:
+            return
+        while self.is_ai_turn() and self.game.moves:
+            self.game.undo()
+        self.show_turn()
 
-        # check for a draw
-        if np.all(self.board) and self.winner is None:
-            self.winner = Player.DRAW.value
+    def redo_move(self):
+        """
+        Replays the last undone move, and the computer's reply to it.
+        """
+        if self.game.redo() is None:
+            return
+        while self.is_ai_turn() and self.game.redo_moves:
+            self.game.redo()
+        self.show_turn()
 
-        # declare winner
-        if self.winner:
-            if self.winner == Player.DRAW.value:
-                message = Messages.DRAW.value
-            else:
-                message = Messages.WINNER.value.format(self.winner)
+    def play_action(self, action):
+        """
+        Plays a parsed input: a (row, col) move or "undo"/"redo".
+        """
+        if action == "undo":
+            self.undo_move()
+        elif action == "redo":
+            self.redo_move()
+        else:
+            self.handle_click(*action)
 
-            play_again = messagebox.askyesno(
-                "Game Over", Messages.REMATCH.value.format(message)
-            )
+    def show_turn(self):
+        """
+        Shows whose turn it is in the entry field and the console.
+        """
+        self.entry.update(Messages.Player_TURN.value.format(self.current_player.value))
+        print(Messages.Player_TURN.value.format(self.current_player.value))
 
-            # recreate board if answer is yes otherwise close the window
-            if play_again:
-                self.recreate_board()
-            else:
-                # stop listening before closing the window
-                if self.mic_is_on:
-                    self.listening(wait_for_stop=False)
-                self.window.quit()
-                return
+    ## Game events ##
+    def on_move(self, game, index, stone):
+        """
+        Draws the stone that was just placed.
+        """
+        row, col = game.board.coordinates(index)
+        if stone == X:
+            self.config_button(row, col, text=Player.X.value, color="red")
+        else:
+            self.config_button(row, col, text=Player.O.value, color="green")
+        if self.is_ai_turn():
+            self.start_ai_move()
+        self.schedule_hints()
 
-    def check_3x3_diagonals(self):
+    def on_undo(self, game, index, stone):
+        """
+        Clears the cell that was taken back and any winning highlight.
         """
-        Checks for three consecutive X or O in diagonals for a 3x3 board.
+        row, col = game.board.coordinates(index)
+        self.config_button(row, col)
+        for row, col in self.highlighted:
+            stone = game.board.get(row, col)
+            if stone:
+                self.config_button(
+                    row,
+                    col,
+                    text=Player.X.value if stone == X else Player.O.value,
+                    color="red" if stone == X else "green",
+                )
+        self.highlighted = []
+        self.cancel_ai_move()
+        self.schedule_hints()
 
-        Diagonals include the main diagonal and anti-diagonal.
+    def on_reset(self, game):
+        """
+        Forgets the highlight, hints and pending computer move of the
+        previous game.
+        """
+        self.highlighted = []
+        self.hinted = []
+        self.cancel_ai_move()
+        self.schedule_hints()
 
+    def on_game_over(self, game):
+        """
+        Highlights the winning line and declares the result.
         """
-        diagonals = [
-            [(self.board[i][i], (i, i)) for i in range(3)],  # main diagonal
-            [(self.board[i][2 - i], (i, 2 - i)) for i in range(3)],  # anti-diagonal
-        ]
+        if game.winning_line:
+            self.highlighted = [game.board.coordinates(i) for i in game.winning_line]
+            self.config_bground(self.highlighted)
+        # declare once every observer has seen the final move, since a
+        # rematch resets the game
+        self.window.after_idle(self.check_winner)
 
-        for diagonal in diagonals:
-            winner, coordinates = self.check_consecutive(diagonal)
-            if winner:
-                self.config_bground(coordinates)
-                return True, coordinates
+    ## Computer player ##
+    def create_ai(self, opponent=2):
+        """
+        Creates the computer player for the current board. Its solution cache
+        is only loaded when the first move is searched.
 
-        return False, []
+        Parameters:
+        - opponent (int): 2 for alpha-beta search, 3 for Monte Carlo tree search.
+        """
+        with STARTUP.phase("ai (lazy)"):
+            from ai import AlphaBetaPlayer, DEFAULT_TIME_BUDGET
+            from book import open_book
+        if opponent == 3:
+            from mcts import MCTSPlayer
+
+            return MCTSPlayer(self.ai_time_budget or DEFAULT_TIME_BUDGET)
+        board = self.game.board
+        return AlphaBetaPlayer(
+            self.ai_time_budget or DEFAULT_TIME_BUDGET,
+            book=open_book(board.rows, board.cols, board.k),
+        )
 
-    def check_5x5_diagonals(self):
+    def is_ai_turn(self):
         """
-        Checks for four consecutive X or O in diagonals for a 5x5 board.
-
-        Diagonals include the main diagonal and anti-diagonal.
+        Returns True if the computer opponent is to move.
+        """
+        return self.ai is not None and not self.game.is_over() and self.game.to_move == O
 
+    def start_ai_move(self):
+        """
+        Starts the search on a snapshot of the game in a background thread so
+        the mainloop stays responsive while the computer thinks. A search
+        still running for an earlier position is cut short first.
         """
-        diagonals = [
-            [(self.board[i][i], (i, i)) for i in range(5)],  # main diagonal
-            [(self.board[i][4 - i], (i, 4 - i)) for i in range(5)],  # anti-diagonal
-        ]
+        self.cancel_ai_move()
+        threading.Thread(
+            target=self.think, args=(self.ai, self.game.copy(), self.ai_search), daemon=True
+        ).start()
 
-        for i in range(1, 2):
-            # main diagonal shifted right
-            diagonals.append([(self.board[j][j + i], (j, j + i)) for j in range(5 - i)])
-            # main diagonal shifted left
-            diagonals.append([(self.board[j + i][j], (j + i, j)) for j in range(5 - i)])
-            # anti-diagonal shifted right
-            diagonals.append(
-                [(self.board[j][4 - (j + i)], (j, 4 - (j + i))) for j in range(5 - i)]
-            )
-            # anti-diagonal shifted left
-            diagonals.append(
-                [(self.board[j + i][4 - j], (j + i, 4 - j)) for j in range(5 - i)]
-            )
+    def cancel_ai_move(self):
+        """
+        Stops the running search, if any, and makes sure its move is never played.
+        """
+        self.ai_search += 1
+        if self.ai is not None:
+            self.ai.abort()
 
-        for diagonal in diagonals:
-            winner, coordinates = self.check_consecutive(diagonal)
-            if winner:
-                self.config_bground(coordinates)
-                return True, coordinates
+    def think(self, ai, snapshot, search):
+        """
+        Runs the search and hands the chosen move back to the Tk thread.
+        The player runs one search at a time, so a new search waits for an
+        aborted one to return.
 
-        return False, []
+        Parameters:
+        - ai (object): The computer player.
+        - snapshot (Game): A copy of the game taken when the search started.
+        - search (int): The search number from start_ai_move.
+        """
+        index = ai.choose_move(snapshot)
+        if hasattr(ai, "playouts_per_sec"):
+            print(f"MCTS: {ai.playouts} playouts, {ai.playouts_per_sec:,.0f}/s, {ai.nodes_in_use():,} nodes")
+        self.window.after(0, self.play_ai_move, index, snapshot.moves, search)
 
-    def check_7x7_diagonals(self):
+    def play_ai_move(self, index, moves, search):
         """
-        Checks for four consecutive X or O in diagonals for a 7x7 board.
+        Plays the computer's move unless the game changed while it was thinking.
 
-        Diagonals include the main diagonal and anti-diagonal.
+        Parameters:
+        - index (int): The flat cell index chosen by the search.
+        - moves (list): The moves of the game the search was run on.
+        - search (int): The search number; older searches are ignored.
+        """
+        if index is None or search != self.ai_search or self.game.moves != moves:
+            return
+        self.game.play(index)
+        self.entry.update(Messages.Player_TURN.value.format(self.current_player.value))
+        print(Messages.Player_TURN.value.format(self.current_player.value))
 
+    ## Hints ##
+    def toggle_hints(self):
         """
-        diagonals = [
-            [(self.board[i][i], (i, i)) for i in range(7)],  # main diagonal
-            [(self.board[i][6 - i], (i, 6 - i)) for i in range(7)],  # anti-diagonal
-        ]
+        Turns the hint overlay on or off.
+        """
+        if self.hint_worker is None:
+            from ai import PRUNING_MIN_CELLS
+            from hints import HintWorker
+            from threats import ThreatTracker
 
-        # Add shifted diagonals
-        for i in range(1, 4):
-            # main diagonal shifted right
-            diagonals.append([(self.board[j][j + i], (j, j + i)) for j in range(7 - i)])
-            # main diagonal shifted left
-            diagonals.append([(self.board[j + i][j], (j + i, j)) for j in range(7 - i)])
-            # anti-diagonal shifted right
-            diagonals.append(
-                [(self.board[j][6 - (j + i)], (j, 6 - (j + i))) for j in range(7 - i)]
-            )
-            # anti-diagonal shifted left
-            diagonals.append(
-                [(self.board[j + i][6 - j], (j + i, 6 - j)) for j in range(7 - i)]
-            )
+            self.hint_min_cells = PRUNING_MIN_CELLS
+            self.hint_worker = HintWorker(self.publish_hints)
+            # kept up to date by every move, for the candidates on large boards
+            self.threats = ThreatTracker(self.game.board)
+            self.game.add_observer(self.threats)
+        else:
+            self.hint_worker.cancel()
+            self.game.remove_observer(self.threats)
+            self.hint_worker = None
+        self.schedule_hints()
+
+    def schedule_hints(self):
+        """
+        Restarts the analysis once the current events are handled, so a
+        burst of moves (undo, redo, the computer's reply) starts it once.
+        """
+        if not self.hint_pending:
+            self.hint_pending = True
+            self.window.after_idle(self.refresh_hints)
+
+    def refresh_hints(self):
+        """
+        Cancels the analysis of the previous position, clears its shading
+        and starts analyzing the current one for the human to move.
+        """
+        self.hint_pending = False
+        self.hint_generation += 1
+        board = self.game.board
+        for row, col in self.hinted:
+            if row < board.rows and col < board.cols and not board.get(row, col):
+                self.config_button(row, col)
+        self.hinted = []
+        self.window.title(f"{self.title} {self.rows}x{self.cols}")
+        if self.hint_worker is None:
+            return
+        if self.game.is_over() or self.is_ai_turn():
+            self.hint_worker.cancel()
+            return
+        if board.size < self.hint_min_cells:
+            candidates = self.game.legal_moves()
+        else:
+            from hints import HINT_MAX_CANDIDATES
 
-        for diagonal in diagonals:
-            winner, coordinates = self.check_consecutive(diagonal)
-            if winner:
-                self.config_bground(coordinates)
-                return True
+            candidates = self.threats.candidates(self.game.to_move)[:HINT_MAX_CANDIDATES]
+        self.hint_worker.start(self.game.copy(), candidates, self.hint_generation)
 
-        return False
+    def publish_hints(self, generation, stats, playouts):
+        """
+        Hands hint results from the worker thread to the Tk thread.
+        """
+        self.window.after(0, self.show_hints, generation, stats, playouts)
 
-    def check_consecutive(self, line):
+    def show_hints(self, generation, stats, playouts):
         """
-        Checks if there are four consecutive X or O in the given line.
+        Shades the analyzed cells, brightest for the strongest move, and
+        shows the chances of the best move in the title.
 
         Parameters:
-        - line (list): The row, column, or diagonal to check.
+        - generation (int): The analysis the results belong to.
+        - stats (dict): {cell: (win rate, draw rate, playouts)}.
+        - playouts (int): Playouts so far.
+        """
+        if generation != self.hint_generation or not stats:
+            return
+        from hints import shade
+
+        # a draw counts half a win
+        values = {cell: win + draw / 2 for cell, (win, draw, _) in stats.items()}
+        low, high = min(values.values()), max(values.values())
+        board = self.game.board
+        self.hinted = []
+        for cell, value in values.items():
+            row, col = board.coordinates(cell)
+            strength = (value - low) / (high - low) if high > low else 1.0
+            self.config_button(row, col, background=shade(strength))
+            self.hinted.append((row, col))
+        win, draw, _ = stats[max(values, key=values.get)]
+        self.window.title(
+            f"{self.title} {self.rows}x{self.cols} - {self.current_player.value} "
+            f"wins {win:.0%}, draws {draw:.0%} ({playouts} playouts)"
+        )
 
-        Returns:
-        - bool: True if there are four consecutive X or O, False otherwise.
-        """
-        consecutive_count = 0
-        last_cell = None
-        consecutive_to_win = 4 if self.rows == 5 or self.rows == 7 else 3
-        coordinates = []
-        for i, (cell, coord) in enumerate(line):
-            if cell == 0:
-                consecutive_count = 0
-                last_cell = None
-            elif cell == last_cell:
-                consecutive_count += 1
-                coordinates.append(coord)
-                if consecutive_count == consecutive_to_win:
-                    self.winner = Player.X.value if last_cell == 1 else Player.O.value
-                    return True, coordinates
+    ## Check ##
+    def check_winner(self):
+        """
+        Declares the winner or a tie and offers a rematch once the game is over.
+        """
+        if self.winner:
+            if self.winner == Player.DRAW.value:
+                message = Messages.DRAW.value
             else:
-                consecutive_count = 1
-                last_cell = cell
-                coordinates = [coord]
+                message = Messages.WINNER.value.format(self.winner)
 
-        return False, []
+            play_again = messagebox.askyesno(
+                "Game Over", Messages.REMATCH.value.format(message)
+            )
+
+            # recreate board if answer is yes otherwise close the window
+            if play_again:
+                self.recreate_board()
+            else:
+                # stop listening before closing the window
+                self.stop_listening()
+                self.window.quit()
+                return
 
     ## Process ##
     def process_text(self):
@@ -381,7 +644,11 @@ class TicTacToe:
         move = self.entry.get()
         self.entry.update()
         try:
-            row, col = self.extract_coordinates(move)
+            action = self.extract_action(move)
+            if type(action) is str:
+                self.play_action(action)
+                return
+            row, col = action
             if (row is not None) and (col is not None):
                 self.handle_click(row, col)
             else:
@@ -389,28 +656,70 @@ class TicTacToe:
         except ValueError:
             print("Invalid move!", Messages.WARNING_TEXT.value)
 
-    def process_speech(self, recognizer, audio):
+    def poll_speech(self):
         """
-        This function is called when audio is received from the microphone.
+        Plays moves recognized by the speech pipeline. Runs on the Tk thread
+        every SPEECH_POLL_MS while the mic is on.
+        """
+        if not self.mic_is_on:
+            self.speech_poll = None
+            return
+        self.speech_pipeline.drain(self.play_action)
+        self.speech_poll = self.window.after(SPEECH_POLL_MS, self.poll_speech)
+
+    def stop_listening(self):
+        """
+        Closes the microphone and stops the speech pipeline.
+        """
+        if self.audio_session is None:
+            return
+        self.audio_session.close()
+        self.audio_session = None
+        self.mic_is_on = False
+        print(self.speech_pipeline.report())
+
+    def shutdown(self):
+        """
+        Stops listening, the hint analysis and the spectator stream, writes
+        the game record and prints the instrumentation report before the app
+        exits.
+        """
+        self.stop_listening()
+        if self.hint_worker is not None:
+            self.hint_worker.cancel()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.spectators is not None:
+            self.spectators.close()
+            self.spectators = None
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.metrics is not None:
+            print(self.metrics.report())
+
+    def process_partial_speech(self, text, final, latency):
+        """
+        This function is called by a streaming speech engine with every
+        partial transcript, so the move is played as soon as both its row and
+        column have been heard.
 
         Parameters:
-        - recognizer (Recognizer): The speech recognizer.
-        - audio (AudioData): The audio data.
+        - text (str): The transcript so far.
+        - final (bool): True once the utterance has ended.
+        - latency (float): Seconds since the first word was recognized.
+
+        Returns:
+        - bool: True if the transcript named a full move.
         """
-        try:
-            speech = recognizer.recognize_google(audio)
-            print(Messages.GOOGLE_SPEECH.value.format(speech))
-            row, col = self.extract_coordinates(speech)
-            if (row is not None) and (col is not None):
-                self.window.after(0, self.handle_click, row, col)
-            else:
-                raise ValueError
-        except sr.UnknownValueError:
-            print(Messages.GOOGLE_UNKNOWN_ERROR.value)
-        except sr.RequestError as e:
-            print(Messages.GOOGLE_REQUEST_ERROR.value.format(e))
-        except ValueError:
-            print("Invalid move!", Messages.WARNING_SPEECH.value)
+        if self.speech_pipeline.push_text(text, final=final):
+            print(
+                Messages.SPEECH_RESULT.value.format(
+                    self.speech_backend.name, text, latency * 1000
+                )
+            )
+            return True
+        return False
 
     def extract_coordinates(self, input):
         """
@@ -422,43 +731,27 @@ class TicTacToe:
         Returns:
         - tuple: The row and column indices.
         """
-        # Map spoken/written numbers
-        number_map = {"first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2}
-        if self.rows == 5:
-            number_map.update({"fourth": 3, "4th": 3})
-            number_map.update({"fifth": 4, "5th": 4})
-        elif self == 7:
-            number_map.update({"sixth": 5, "6th": 5})
-            number_map.update({"seventh": 6, "7th": 6})
-
-        # tokenize the speech/text
-        tokens = word_tokenize(input)
-        row = None
-        col = None
-        for i, token in enumerate(tokens):
-            if token in number_map:
-                if i + 1 < len(tokens):
-                    if tokens[i + 1] == "row" or tokens[i + 1] == "rows":
-                        row = number_map[token]
-                    elif tokens[i + 1] == "column" or tokens[i + 1] == "columns" or tokens[i + 1] == "col" or tokens[i + 1] == "cols":
-                        col = number_map[token]
-                    else:
-                        raise ValueError
-            elif token == "middle":
-                row = col = self.rows // 2
-            else:
-                try:
-                    num = int(token)
-                    if (num >= 1) and (num <= self.rows):
-                        if row is None:
-                            row = num - 1
-                        elif col is None:
-                            col = num - 1
-                        else:
-                            raise ValueError
-                except ValueError:
-                    continue
-        return row, col
+        return parser_for(self.rows, self.cols).parse(input)
+
+    def extract_action(self, input):
+        """
+        Extracts a history command or else a move from the input.
+
+        Returns:
+        - str or tuple: "undo", "redo" or the (row, col) of extract_coordinates.
+        """
+        parser = parser_for(self.rows, self.cols)
+        return parser.command(input) or parser.parse(input)
+
+    def extract_partial_action(self, input):
+        """
+        Like extract_action for a partial transcript: a move only counts once
+        its row and column are both named, since "middle" or "left" may be
+        the start of a longer phrase.
+        """
+        parser = parser_for(self.rows, self.cols)
+        return parser.command(input) or parser.parse(input, explicit=True)
+
     ## Main ##
     def main_loop(self):
         """
@@ -468,10 +761,13 @@ class TicTacToe:
         self.window.bind("<Destroy>", self.close_main_app)
         self.window.mainloop()
 
-    def close_main_app(self):
+    def close_main_app(self, event=None):
         """
         Closes the game window.
         """
+        # <Destroy> also fires for every child widget that is destroyed
+        if event is not None and event.widget is not self.window:
+            return
         self.window.quit()
 
 
@@ -482,53 +778,169 @@ def msg_box():
     msg_window = tk.Tk()
     msg_window.withdraw()
     dialog = BoardInputTypeDialog(msg_window)
+    if STARTUP.elapsed("first window") is None:
+        dialog.bind("<Map>", lambda event: first_window_shown(dialog), add="+")
     msg_window.wait_window(dialog)
-    return dialog.board_type, dialog.input_type
+    # a hidden root per dialog would otherwise pile up over rematches
+    msg_window.destroy()
+    return dialog.board_type, dialog.input_type, dialog.opponent
 
 
-def start_game():
+def first_window_shown(dialog):
+    """
+    Records the time to the first window and, when only startup is being
+    measured, closes it again.
+    """
+    if STARTUP.elapsed("first window") is None:
+        STARTUP.mark("first window")
+        if STARTUP.exit_after_first_window:
+            dialog.after_idle(dialog.destroy)
+
+
+def start_game(
+    speech_engine=None,
+    renderer=None,
+    record=None,
+    hints=None,
+    instrument=None,
+    profile=None,
+    spectate=None,
+    spectate_host=None,
+):
     """
     Start the game of Tic Tac Toe.
 
     This function first opens a dialog box to ask the user to choose the board type.
     If the user closes the dialog box without choosing a board type, the function returns and the game does not start.
     If the user chooses a board type, a new game of Tic Tac Toe is started with a board of the chosen type.
+
+    Parameters:
+    - speech_engine (str): The speech engine for speech input, see TicTacToe.
+    - renderer (str): The board renderer, see TicTacToe.
+    - record (str): The game record file, see TicTacToe.
+    - hints (bool): Start with the hint overlay, see TicTacToe.
+    - instrument (bool): Time the hot paths, see TicTacToe.
+    - profile (str): Profile the first game, see TicTacToe.
+    - spectate (int): The spectator port, see TicTacToe.
+    - spectate_host (str): The spectator address, see TicTacToe.
     """
     try:
-        board_type, input_type = msg_box()
+        board_type, input_type, opponent = msg_box()
         if (
-            (board_type is None)
-            or (board_type == 0)
-            or (type(board_type) is not int)
+            (type(board_type) is not tuple)
             or (input_type is None)
             or (input_type == 0)
             or (type(input_type) is not int)
         ):
             return
-        game = TicTacToe(rows=board_type, input_type=input_type)
+        rows, cols, k = board_type
+        game = TicTacToe(
+            rows=rows,
+            cols=cols,
+            k=k,
+            input_type=input_type,
+            opponent=opponent,
+            speech_engine=speech_engine,
+            renderer=renderer,
+            record=record,
+            hints=hints,
+            instrument=instrument,
+            profile=profile,
+            spectate=spectate,
+            spectate_host=spectate_host,
+        )
         game.init_board()
         game.init_input_type()
         while True:
             try:
                 game.main_loop()
-                if game.mic_is_on:
-                        game.listening(wait_for_stop=False)
+                game.shutdown()
                 return
             except KeyboardInterrupt:
                 print(Messages.QUIT.value)
                 cm_input = input()
                 if cm_input.lower() in ["y", "yes"]:
-                    if game.mic_is_on:
-                        game.listening(wait_for_stop=False)
+                    game.shutdown()
                     print("Quiting...")
                     break
     except Exception as e:
         # stop listening
-        if game.mic_is_on:
-            game.listening(wait_for_stop=False)
+        game.shutdown()
         print(e)
         print(Messages.GAME_OVER.value)
         return
 
 if __name__ == "__main__":
-    start_game()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Interactive Tic Tac Toe.")
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="report the import phases and time to the first window, then exit",
+    )
+    parser.add_argument(
+        "--startup-budget",
+        type=float,
+        help="with --startup-time, exit with status 1 if the first window took longer (seconds)",
+    )
+    parser.add_argument(
+        "--speech-engine",
+        choices=["google", "vosk"],
+        help="speech engine for speech input; vosk works offline",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=["buttons", "canvas"],
+        help="draw the board with one button per cell or on a single canvas",
+    )
+    parser.add_argument("--record", help="append every game to this game record file")
+    parser.add_argument(
+        "--hints",
+        action="store_true",
+        help="shade cells by their strength and show win chances (Ctrl+H toggles)",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="time moves, redraws, parsing and speech; report on exit and on Ctrl+P",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["cprofile", "tracemalloc"],
+        help="profile the first game with cProfile or tracemalloc",
+    )
+    parser.add_argument(
+        "--spectate",
+        type=int,
+        metavar="PORT",
+        help="stream the game to spectators (python spectate.py --port PORT)",
+    )
+    parser.add_argument(
+        "--spectate-host",
+        metavar="HOST",
+        help="address to stream on, e.g. 0.0.0.0 for other machines (default 127.0.0.1)",
+    )
+    args = parser.parse_args()
+    STARTUP.mark("imports done")
+    if args.startup_time:
+        STARTUP.exit_after_first_window = True
+        msg_box()
+        print(STARTUP.report())
+        first_window = STARTUP.elapsed("first window")
+        if args.startup_budget is not None and (
+            first_window is None or first_window > args.startup_budget
+        ):
+            print(f"Startup budget of {args.startup_budget * 1000:.0f} ms exceeded.")
+            raise SystemExit(1)
+    else:
+        start_game(
+            args.speech_engine,
+            args.renderer,
+            args.record,
+            args.hints or None,
+            args.instrument or None,
+            args.profile,
+            args.spectate,
+            args.spectate_host,
+        )
@@ -0,0 +1,317 @@
+import math
+import random
+import threading
+import time
+from array import array
+from functools import lru_cache
+from ai import DEFAULT_TIME_BUDGET, PRUNING_MIN_CELLS, rollout
+from board import mask_cells
+from threats import neighbors
+
+
+DEFAULT_MAX_NODES = 1 << 20
+DEFAULT_EXPLORATION = 1.4
+# node fields that mean "none"
+NO_NODE = -1
+# terminal markers: the move into the node did not end the game
+OPEN = -1
+DRAW_RESULT = 0
+
+
+@lru_cache(maxsize=None)
+def near_masks(rows, cols, radius=2):
+    """
+    Returns, for every cell, the bitmask of the cells within radius.
+    """
+    masks = []
+    for cells in neighbors(rows, cols, radius):
+        mask = 0
+        for cell in cells:
+            mask |= 1 << cell
+        masks.append(mask)
+    return tuple(masks)
+
+
+class MCTSPlayer:
+    """
+    A computer player using Monte Carlo tree search with UCT selection and
+    random playouts.
+
+    Nodes live in parallel arrays indexed by node id: the move leading to
+    the node, its parent, first child and next sibling, its visit count and
+    the total result for the player who made the move. Ids of discarded
+    subtrees go on a free list. Once max_nodes ids are in use the tree stops
+    growing and the playouts only refine the existing nodes.
+
+    Between moves the subtree of the position actually reached is kept, so
+    the search continues where it left off.
+    """
+
+    def __init__(
+        self,
+        time_budget=DEFAULT_TIME_BUDGET,
+        max_playouts=None,
+        max_nodes=DEFAULT_MAX_NODES,
+        exploration=DEFAULT_EXPLORATION,
+        seed=None,
+    ):
+        """
+        Initializes the player.
+
+        Parameters:
+        - time_budget (float): Seconds to think per move, or None to only
+          stop at max_playouts.
+        - max_playouts (int): Playouts per move. Default is no limit.
+        - max_nodes (int): The most tree nodes kept at once.
+        - exploration (float): The UCT exploration constant.
+        - seed (int or str): The random seed.
+        """
+        if time_budget is None and max_playouts is None:
+            raise ValueError("MCTSPlayer needs a time budget or a playout limit.")
+        self.time_budget = time_budget
+        self.max_playouts = max_playouts
+        self.max_nodes = max_nodes
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.move = array("i")
+        self.parent = array("i")
+        self.child = array("i")
+        self.sibling = array("i")
+        self.terminal = array("b")
+        self.visits = array("i")
+        self.value = array("d")
+        self.free = []
+        self.root = NO_NODE
+        self.root_moves = None
+        self.root_size = None
+        self.playouts = 0
+        self.playouts_per_sec = 0.0
+        self.aborted = False
+
+    ## Node store ##
+    def new_node(self, move, parent, terminal):
+        """
+        Returns a node id, recycled if possible, or NO_NODE at the cap.
+        """
+        if self.free:
+            node = self.free.pop()
+            self.move[node] = move
+            self.parent[node] = parent
+            self.child[node] = NO_NODE
+            self.sibling[node] = NO_NODE
+            self.terminal[node] = terminal
+            self.visits[node] = 0
+            self.value[node] = 0.0
+            return node
+        node = len(self.move)
+        if node >= self.max_nodes:
+            return NO_NODE
+        self.move.append(move)
+        self.parent.append(parent)
+        self.child.append(NO_NODE)
+        self.sibling.append(NO_NODE)
+        self.terminal.append(terminal)
+        self.visits.append(0)
+        self.value.append(0.0)
+        return node
+
+    def release(self, node):
+        """
+        Puts a node and its whole subtree on the free list.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self.free.append(node)
+            child = self.child[node]
+            while child != NO_NODE:
+                stack.append(child)
+                child = self.sibling[child]
+
+    def nodes_in_use(self):
+        """
+        Returns the number of tree nodes not on the free list.
+        """
+        return len(self.move) - len(self.free)
+
+    ## Tree reuse ##
+    def advance_root(self, game):
+        """
+        Moves the root to the game's position, keeping the matching subtree
+        and recycling the rest.
+        """
+        board = game.board
+        size = (board.rows, board.cols, board.k)
+        moves = game.moves
+        known = self.root_moves
+        if (
+            self.root != NO_NODE
+            and size == self.root_size
+            and len(moves) >= len(known)
+            and moves[: len(known)] == known
+        ):
+            for move in moves[len(known):]:
+                child = self.child[self.root]
+                keep = NO_NODE
+                while child != NO_NODE:
+                    following = self.sibling[child]
+                    if self.move[child] == move and keep == NO_NODE:
+                        keep = child
+                    else:
+                        self.release(child)
+                    child = following
+                self.free.append(self.root)
+                if keep == NO_NODE:
+                    self.root = NO_NODE
+                    break
+                self.root = keep
+                self.parent[keep] = NO_NODE
+                self.sibling[keep] = NO_NODE
+        else:
+            if self.root != NO_NODE:
+                self.release(self.root)
+            self.root = NO_NODE
+        if self.root == NO_NODE:
+            self.root = self.new_node(NO_NODE, NO_NODE, OPEN)
+        self.root_moves = list(moves)
+        self.root_size = size
+
+    ## Search ##
+    def expand(self, node, board, stone):
+        """
+        Adds a child for every move worth trying from the node's position.
+        Large boards only get moves near stones.
+        """
+        occupied = board.bits[1] | board.bits[2]
+        if board.size >= PRUNING_MIN_CELLS and occupied:
+            near = 0
+            masks = near_masks(board.rows, board.cols)
+            for cell in mask_cells(occupied):
+                near |= masks[cell]
+            cells = mask_cells(near & ~occupied)
+        else:
+            cells = board.legal_moves()
+        self.rng.shuffle(cells)
+        last = NO_NODE
+        for cell in cells:
+            board.place(cell, stone)
+            if board.is_win(cell):
+                terminal = stone
+            elif board.is_full():
+                terminal = DRAW_RESULT
+            else:
+                terminal = OPEN
+            board.remove(cell)
+            child = self.new_node(cell, node, terminal)
+            if child == NO_NODE:
+                break
+            if last == NO_NODE:
+                self.child[node] = child
+            else:
+                self.sibling[last] = child
+            last = child
+
+    def select(self, node):
+        """
+        Returns the child with the best UCT score; unvisited children first.
+        """
+        visits, value = self.visits, self.value
+        log_parent = math.log(visits[node] + 1)
+        c = self.exploration
+        best, best_score = NO_NODE, -1.0
+        child = self.child[node]
+        while child != NO_NODE:
+            n = visits[child]
+            if n == 0:
+                return child
+            score = value[child] / n + c * math.sqrt(log_parent / n)
+            if score > best_score:
+                best, best_score = child, score
+            child = self.sibling[child]
+        return best
+
+    def playout(self, root_board, to_move):
+        """
+        Runs one selection, expansion, rollout and backpropagation.
+        """
+        board = root_board.copy()
+        node = self.root
+        stone = to_move
+        while self.child[node] != NO_NODE:
+            node = self.select(node)
+            board.place(self.move[node], stone)
+            stone = 3 - stone
+            if self.terminal[node] != OPEN:
+                break
+        result = self.terminal[node]
+        if result == OPEN:
+            if self.visits[node] > 0 or node == self.root:
+                self.expand(node, board, stone)
+                if self.child[node] != NO_NODE:
+                    node = self.select(node)
+                    board.place(self.move[node], stone)
+                    stone = 3 - stone
+                    result = self.terminal[node]
+            if result == OPEN:
+                result = rollout(board, stone, self.rng)
+
+        # each node scores the result for the player who moved into it
+        mover = 3 - stone
+        visits, value, parent = self.visits, self.value, self.parent
+        while node != NO_NODE:
+            visits[node] += 1
+            if result == DRAW_RESULT:
+                value[node] += 0.5
+            elif result == mover:
+                value[node] += 1.0
+            mover = 3 - mover
+            node = parent[node]
+
+    def choose_move(self, game):
+        """
+        Picks a move for the player to move in the given game.
+
+        Parameters:
+        - game (Game): The game to move in. It is not modified.
+
+        Returns:
+        - int: The flat cell index to play, or None if the game is over.
+        """
+        if game.is_over():
+            return None
+        with self.lock:
+            self.aborted = False
+            self.advance_root(game)
+            board = game.board
+            started = time.perf_counter()
+            deadline = float("inf") if self.time_budget is None else started + self.time_budget
+            playouts = 0
+            while (self.max_playouts is None or playouts < self.max_playouts) and (
+                playouts & 15 or (not self.aborted and time.perf_counter() < deadline)
+            ):
+                self.playout(board, game.to_move)
+                playouts += 1
+            elapsed = time.perf_counter() - started
+            self.playouts = playouts
+            self.playouts_per_sec = playouts / elapsed if elapsed else 0.0
+
+            best, best_visits = NO_NODE, -1
+            child = self.child[self.root]
+            while child != NO_NODE:
+                # a win on the spot beats any visit count
+                if self.terminal[child] == game.to_move:
+                    return self.move[child]
+                if self.visits[child] > best_visits:
+                    best, best_visits = child, self.visits[child]
+                child = self.sibling[child]
+            if best == NO_NODE:
+                return self.rng.choice(game.legal_moves())
+            return self.move[best]
+
+    def abort(self):
+        """
+        Makes the running search, if any, stop after its current batch of
+        playouts, e.g. because the position changed.
+        """
+        self.aborted = True
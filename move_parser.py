@@ -0,0 +1,221 @@
+import re
+from functools import lru_cache
+
+
+UNITS = (
+    "", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+)
+TENS = ("", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety")
+IRREGULAR_ORDINALS = {
+    "one": "first", "two": "second", "three": "third", "five": "fifth",
+    "eight": "eighth", "nine": "ninth", "twelve": "twelfth",
+}
+
+ROW_WORDS = frozenset(("row", "rows"))
+COLUMN_WORDS = frozenset(("column", "columns", "col", "cols"))
+MIDDLE_WORDS = frozenset(("middle", "center", "centre"))
+# top/bottom pick a row, left/right pick a column
+EDGE_WORDS = {"top": ("row", 0), "bottom": ("row", -1), "left": ("col", 0), "right": ("col", -1)}
+# history commands instead of a move
+HISTORY_WORDS = {"undo": "undo", "takeback": "undo", "redo": "redo"}
+
+# words, numbers with optional ordinal suffix, and algebraic cells like "b3"
+TOKEN_PATTERN = re.compile(r"[a-z]\d+\b|\d+(?:st|nd|rd|th)?|[a-z]+")
+ALGEBRAIC_PATTERN = re.compile(r"([a-z])(\d+)")
+NUMBER_PATTERN = re.compile(r"(\d+)(?:st|nd|rd|th)?")
+
+
+def ordinal(word):
+    """
+    Returns the spelled-out ordinal of a spelled-out cardinal below 100.
+    """
+    head, _, last = word.rpartition(" ")
+    if last in IRREGULAR_ORDINALS:
+        last = IRREGULAR_ORDINALS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return f"{head} {last}" if head else last
+
+
+@lru_cache(maxsize=None)
+def number_words():
+    """
+    Maps spelled-out cardinals and ordinals from 1 to 99 to their value,
+    e.g. "twelve", "twelfth", "twenty one" and "twenty first".
+    """
+    words = {}
+    for n in range(1, 100):
+        if n < 20:
+            word = UNITS[n]
+        elif n % 10 == 0:
+            word = TENS[n // 10]
+        else:
+            word = f"{TENS[n // 10]} {UNITS[n % 10]}"
+        words[word] = n
+        words[ordinal(word)] = n
+    return words
+
+
+class MoveParser:
+    """
+    Turns typed or spoken move commands into board coordinates.
+
+    Understands numbers ("1 2", "third row 2nd column", "row three column
+    one"), spelled-out numbers, "middle", edge and corner phrases ("top
+    left", "bottom middle") and algebraic cells where the letter is the
+    column and the number the row counted from the top ("b3"). The history
+    commands "undo" and "redo" are recognized by command.
+    """
+
+    def __init__(self, rows, cols):
+        """
+        Builds the lookup table for a board size.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        """
+        self.rows = rows
+        self.cols = cols
+        # numbers beyond the board are still recognized so they can be rejected
+        self.numbers = number_words()
+
+    def tokens(self, text):
+        """
+        Splits text into tokens, joining two-word numbers like "twenty one"
+        and resolving every number to its value.
+
+        Returns:
+        - list: Tokens, with numbers as ints and everything else as str.
+        """
+        words = TOKEN_PATTERN.findall(text.lower())
+        numbers = self.numbers
+        tokens = []
+        i = 0
+        while i < len(words):
+            word = words[i]
+            if i + 1 < len(words) and f"{word} {words[i + 1]}" in numbers:
+                tokens.append(numbers[f"{word} {words[i + 1]}"])
+                i += 2
+                continue
+            if word in numbers:
+                tokens.append(numbers[word])
+            elif word[0].isdigit():
+                tokens.append(int(NUMBER_PATTERN.fullmatch(word).group(1)))
+            else:
+                tokens.append(word)
+            i += 1
+        return tokens
+
+    def command(self, text):
+        """
+        Returns "undo" or "redo" if text is a history command, else None.
+        """
+        for token in self.tokens(text):
+            if type(token) is str and token in HISTORY_WORDS:
+                return HISTORY_WORDS[token]
+        return None
+
+    def parse(self, text, explicit=False):
+        """
+        Extracts the row and column indices from a move command.
+
+        Parameters:
+        - text (str): The typed text or speech transcript.
+        - explicit (bool): Ignore "middle" and edge words such as "left",
+          which may still be completed by what follows, e.g. in a partial
+          transcript of "middle row third column".
+
+        Returns:
+        - tuple: The 0-based (row, col); either may be None if the command
+          does not name it.
+        """
+        tokens = self.tokens(text)
+        row = col = None
+
+        # algebraic notation names both coordinates at once
+        for token in tokens:
+            if type(token) is str:
+                match = ALGEBRAIC_PATTERN.fullmatch(token)
+                if match:
+                    c = ord(match.group(1)) - ord("a")
+                    r = int(match.group(2)) - 1
+                    if 0 <= r < self.rows and 0 <= c < self.cols:
+                        return r, c
+
+        # pair every number or place word with the nearest unused row or
+        # column word, before ("row 3") or after it ("3rd row", "middle row")
+        pairs = []
+        value = axis = None
+        for token in tokens:
+            if token in ROW_WORDS or token in COLUMN_WORDS:
+                keyword = "row" if token in ROW_WORDS else "col"
+                if value is None:
+                    axis = keyword
+                else:
+                    pairs.append((value, keyword))
+                    value = None
+            elif type(token) is int or token in MIDDLE_WORDS or token in EDGE_WORDS:
+                if axis is not None:
+                    pairs.append((token, axis))
+                    axis = None
+                else:
+                    if value is not None:
+                        pairs.append((value, None))
+                    value = token
+        if value is not None:
+            pairs.append((value, None))
+
+        loose = []
+        middle = False
+        for token, axis in pairs:
+            if type(token) is int:
+                if axis is None:
+                    loose.append(token)
+                elif axis == "row":
+                    if 1 <= token <= self.rows:
+                        row = token - 1
+                elif 1 <= token <= self.cols:
+                    col = token - 1
+            elif explicit:
+                continue
+            elif token in EDGE_WORDS:
+                edge, index = EDGE_WORDS[token]
+                if edge == "row":
+                    row = index % self.rows
+                else:
+                    col = index % self.cols
+            elif axis == "row":
+                row = self.rows // 2
+            elif axis == "col":
+                col = self.cols // 2
+            else:
+                middle = True
+
+        # bare numbers fill the row first, then the column
+        for number in loose:
+            if row is None:
+                if 1 <= number <= self.rows:
+                    row = number - 1
+            elif col is None:
+                if 1 <= number <= self.cols:
+                    col = number - 1
+
+        if middle:
+            if row is None:
+                row = self.rows // 2
+            if col is None:
+                col = self.cols // 2
+        return row, col
+
+
+@lru_cache(maxsize=None)
+def parser_for(rows, cols):
+    """
+    Returns the cached MoveParser for a board size.
+    """
+    return MoveParser(rows, cols)
@@ -0,0 +1,294 @@
+import argparse
+import mmap
+import os
+import struct
+from collections import Counter, namedtuple
+from game import Game, GameObserver, X, O, DRAW
+
+
+RECORD_MAGIC = b"TTTR"
+RECORD_VERSION = 1
+FILE_HEADER = struct.Struct("<4sB")
+# rows, cols, k and result of one game; the moves follow as a varint byte
+# length and one varint cell index per move
+GAME_HEADER = struct.Struct("<BBBB")
+# result of a game that was abandoned before it ended
+UNFINISHED = 0
+RESULT_NAMES = {UNFINISHED: "unfinished", X: "x", O: "o", DRAW: "draw"}
+# buffered bytes that trigger a write
+DEFAULT_FLUSH_BYTES = 1 << 16
+
+GameRecord = namedtuple("GameRecord", "rows cols k result moves")
+
+
+def write_varint(out, value):
+    """
+    Appends value to out as a varint: 7 bits per byte, low bits first, the
+    high bit set on every byte but the last. Cells below 128 take one byte.
+    """
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """
+    Reads a varint written by write_varint.
+
+    Returns:
+    - tuple: (value, offset just past it)
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_game(rows, cols, k, result, moves):
+    """
+    Returns the bytes of one game record.
+
+    Parameters:
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board.
+    - k (int): The number of consecutive stones needed to win.
+    - result (int): X, O, DRAW or UNFINISHED.
+    - moves (list): The flat cell indexes played, in order.
+    """
+    body = bytearray()
+    for move in moves:
+        write_varint(body, move)
+    out = bytearray(GAME_HEADER.pack(rows, cols, k, result))
+    write_varint(out, len(body))
+    return out + body
+
+
+class GameLog:
+    """
+    An append-only file of game records.
+
+    Games are buffered and written in batches of about flush_bytes, so
+    recording costs no disk access per move. Call close (or use the log as a
+    context manager) to write the rest.
+    """
+
+    def __init__(self, path, flush_bytes=DEFAULT_FLUSH_BYTES):
+        """
+        Opens the log for appending, creating it if needed.
+
+        Parameters:
+        - path (str): The log file.
+        - flush_bytes (int): Buffered bytes that trigger a write.
+        """
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.buffer = bytearray()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.buffer += FILE_HEADER.pack(RECORD_MAGIC, RECORD_VERSION)
+
+    def append(self, rows, cols, k, result, moves):
+        """
+        Adds one game; see encode_game.
+        """
+        self.buffer += encode_game(rows, cols, k, result, moves)
+        if len(self.buffer) >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered games.
+        """
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecorder(GameObserver):
+    """
+    Records every game played on a Game into a GameLog.
+
+    A game is written when it ends, or as unfinished when the board is reset
+    before that. Undone moves are not recorded; a game that is taken back
+    after its end is only written again if it continues differently.
+    """
+
+    def __init__(self, log):
+        """
+        Parameters:
+        - log (GameLog): Where finished games go.
+        """
+        self.log = log
+        # the move list of the game in progress; Game.reset replaces it with
+        # a new list, so this one still holds the abandoned game in on_reset
+        self.moves = []
+        self.size = None
+        # the moves of the last record of this game, so taking it back
+        # without playing anything new does not write it again
+        self.written = None
+
+    def track(self, game):
+        board = game.board
+        self.moves = game.moves
+        self.size = (board.rows, board.cols, board.k)
+
+    def on_move(self, game, index, stone):
+        self.track(game)
+
+    def on_undo(self, game, index, stone):
+        self.track(game)
+
+    def on_game_over(self, game):
+        moves = list(game.moves)
+        if moves != self.written:
+            self.log.append(*self.size, game.winner, moves)
+            self.written = moves
+        self.moves = []
+
+    def on_reset(self, game):
+        moves = list(self.moves)
+        if moves and (self.written is None or moves != self.written[: len(moves)]):
+            self.log.append(*self.size, UNFINISHED, moves)
+        self.moves = []
+        self.written = None
+
+    def close(self):
+        """
+        Records the game in progress as unfinished and closes the log.
+        """
+        self.on_reset(None)
+        self.log.close()
+
+
+def scan(path, rows=None, cols=None, k=None, result=None):
+    """
+    Streams the games of a log through a memory map.
+
+    Games that do not match the filters are skipped without decoding their
+    moves. A game cut short by a crash ends the scan.
+
+    Parameters:
+    - path (str): The log file.
+    - rows, cols, k, result (int): Only yield games with these values.
+
+    Yields:
+    - GameRecord: (rows, cols, k, result, moves) with moves as a tuple.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version = FILE_HEADER.unpack_from(data)
+            if (magic, version) != (RECORD_MAGIC, RECORD_VERSION):
+                raise ValueError(f"{path} is not a game record file.")
+            offset = FILE_HEADER.size
+            end = len(data)
+            while offset + GAME_HEADER.size < end:
+                header = GAME_HEADER.unpack_from(data, offset)
+                try:
+                    length, start = read_varint(data, offset + GAME_HEADER.size)
+                except IndexError:
+                    return
+                offset = start + length
+                if offset > end:
+                    return
+                if (
+                    (rows is not None and header[0] != rows)
+                    or (cols is not None and header[1] != cols)
+                    or (k is not None and header[2] != k)
+                    or (result is not None and header[3] != result)
+                ):
+                    continue
+                body = data[start:offset]
+                # on boards below 128 cells every move is a single byte
+                if not body or max(body) < 0x80:
+                    yield GameRecord(*header, tuple(body))
+                    continue
+                moves = []
+                i = 0
+                while i < length:
+                    move, i = read_varint(body, i)
+                    moves.append(move)
+                yield GameRecord(*header, tuple(moves))
+
+
+def replay(record, ply=None):
+    """
+    Reconstructs a recorded game.
+
+    Parameters:
+    - record (GameRecord): The game.
+    - ply (int): Moves to play. Default plays them all.
+
+    Returns:
+    - Game: The position after ply moves.
+    """
+    game = Game(record.rows, record.cols, record.k)
+    board = game.board
+    # place the stones directly; only the last move is checked for a win
+    moves = record.moves if ply is None else record.moves[:ply]
+    stone = X
+    for index in moves:
+        board.place(index, stone)
+        stone = O if stone == X else X
+    game.moves = list(moves)
+    game.to_move = stone
+    if moves:
+        last = moves[-1]
+        if board.is_win(last):
+            game.winner = board.stone_at(last)
+            game.winning_line = board.winning_line(last)
+        elif board.is_full():
+            game.winner = DRAW
+    return game
+
+
+def openings(path, plies=2, **filters):
+    """
+    Counts the first plies moves of every game in a log.
+
+    Returns:
+    - Counter: {tuple of cell indexes: games}
+    """
+    counts = Counter()
+    for record in scan(path, **filters):
+        if len(record.moves) >= plies:
+            counts[record.moves[:plies]] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a game record file.")
+    parser.add_argument("path")
+    parser.add_argument("--plies", type=int, default=2, help="length of the openings to count")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    results = Counter()
+    games = 0
+    for record in scan(args.path):
+        games += 1
+        results[(record.rows, record.cols, record.k, RESULT_NAMES[record.result])] += 1
+    print(f"{games} games")
+    for (rows, cols, k, result), n in sorted(results.items()):
+        print(f"  {rows}x{cols}:{k} {result:<11}{n:8d}")
+    print(f"Most common openings ({args.plies} plies):")
+    for moves, n in openings(args.path, args.plies).most_common(args.top):
+        print(f"  {' '.join(map(str, moves)):<20}{n:8d}")
@@ -0,0 +1,255 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+
+# cells are drawn smaller on boards larger than 7x7 so they fit on screen
+LARGE_BOARD = 7
+CELL_SIZE = 150
+LARGE_CELL_SIZE = 36
+# hidden buttons kept for the next resize
+POOL_SIZE = 64
+EMPTY = ("", "black", "black")
+
+
+class ButtonRenderer:
+    """
+    Draws the board as one tk.Button per cell.
+
+    Every renderer takes the window, the board size and a click handler
+    called with (row, col), and provides draw, reset and destroy.
+
+    Buttons outlive the board size: on a resize they are moved to their new
+    cells, spare ones wait hidden in a pool of up to POOL_SIZE and the rest
+    are destroyed. What each button shows is remembered, so only cells that
+    actually change are reconfigured.
+    """
+
+    def __init__(self, window, rows, cols, on_click):
+        """
+        Creates the board.
+
+        Parameters:
+        - window (Tk): The game window; cells take grid rows 0..rows-1.
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        - on_click (callable): Called with (row, col) when a cell is clicked.
+        """
+        self.window = window
+        self.on_click = on_click
+        self.buttons = []
+        self.shown = []
+        self.pool = []
+        self.rows = self.cols = 0
+        self.reset(rows, cols)
+
+    def reset(self, rows, cols):
+        """
+        Clears the board, moving the buttons if the size changed.
+        """
+        if (rows, cols) == (self.rows, self.cols):
+            for row in range(rows):
+                for col in range(cols):
+                    self.draw(row, col, *EMPTY)
+            return
+        for button in self.buttons:
+            button.grid_forget()
+        self.pool += self.buttons
+        for button in self.pool[POOL_SIZE + rows * cols:]:
+            button.destroy()
+        del self.pool[POOL_SIZE + rows * cols:]
+        # cells of the old board that the new one does not use stop expanding
+        for row in range(rows, self.rows):
+            tk.Grid.rowconfigure(self.window, row, weight=0)
+        for col in range(cols, self.cols):
+            tk.Grid.columnconfigure(self.window, col, weight=0)
+
+        self.rows, self.cols = rows, cols
+        self.buttons = [self.place_button(row, col) for row in range(rows) for col in range(cols)]
+        self.shown = [EMPTY] * (rows * cols)
+
+    def place_button(self, row, col):
+        """
+        Puts a pooled or new button in a cell.
+        """
+        large = max(self.rows, self.cols) > LARGE_BOARD
+        options = {
+            "text": "",
+            "font": ("Times New Roman", 14 if large else 50),
+            "height": 1 if large else 2,
+            "width": 2 if large else 6,
+            "bg": "black",
+            "command": lambda row=row, col=col: self.on_click(row, col),
+        }
+        if self.pool:
+            button = self.pool.pop()
+            button.config(**options)
+        else:
+            button = tk.Button(self.window, **options)
+        button.grid(row=row, column=col, sticky="news")
+
+        # buttons expand with window
+        tk.Grid.rowconfigure(self.window, row, weight=1)
+        tk.Grid.columnconfigure(self.window, col, weight=1)
+        return button
+
+    def draw(self, row, col, text, color, background):
+        """
+        Shows a cell's stone; "" for an empty cell.
+        """
+        i = row * self.cols + col
+        look = (text, color, background)
+        if self.shown[i] != look:
+            self.shown[i] = look
+            self.buttons[i].config(text=text, fg=color, bg=background)
+
+    def destroy(self):
+        """
+        Removes the board from the window.
+        """
+        for button in self.buttons + self.pool:
+            button.destroy()
+        self.buttons = []
+        self.shown = []
+        self.pool = []
+        self.rows = self.cols = 0
+
+
+class CanvasRenderer:
+    """
+    Draws the board on a single tk.Canvas, which stays fast on large boards.
+
+    Each cell is a rectangle and a text item whose ids are kept by cell
+    index. Changed cells are collected and redrawn together once Tk is
+    idle, and clicks are mapped to cells by dividing the coordinates by the
+    cell size.
+    """
+
+    def __init__(self, window, rows, cols, on_click):
+        """
+        Creates the board; see ButtonRenderer.
+        """
+        self.window = window
+        self.on_click = on_click
+        self.canvas = tk.Canvas(window, background="black", highlightthickness=0)
+        self.canvas.bind("<Button-1>", self.click)
+        self.canvas.bind("<Configure>", self.resize)
+        # one font for every stone, so resizing updates it once
+        self.font = tkfont.Font(family="Times New Roman")
+        self.dirty = set()
+        self.flush_pending = None
+        self.rows = self.cols = 0
+        self.reset(rows, cols)
+
+    def reset(self, rows, cols):
+        """
+        Clears the board, recreating the cell items if the size changed.
+        """
+        if (rows, cols) == (self.rows, self.cols):
+            for i in range(rows * cols):
+                self.set_cell(i, EMPTY)
+            return
+        self.canvas.delete("all")
+        for row in range(self.rows):
+            tk.Grid.rowconfigure(self.window, row, weight=0)
+        for col in range(self.cols):
+            tk.Grid.columnconfigure(self.window, col, weight=0)
+        self.rows, self.cols = rows, cols
+        self.cells = [EMPTY] * (rows * cols)
+        self.dirty.clear()
+        cell = LARGE_CELL_SIZE if max(rows, cols) > LARGE_BOARD else CELL_SIZE
+        self.cell_width = self.cell_height = cell
+        self.rects = []
+        self.texts = []
+        for row in range(rows):
+            for col in range(cols):
+                self.rects.append(self.canvas.create_rectangle(0, 0, 0, 0, fill="black", outline="gray30", width=2))
+                self.texts.append(self.canvas.create_text(0, 0, text="", font=self.font))
+        self.layout()
+        self.canvas.config(width=cols * cell, height=rows * cell)
+        self.canvas.grid(row=0, column=0, rowspan=rows, columnspan=cols, sticky="news")
+        # the canvas expands with the window, like the buttons
+        for row in range(rows):
+            tk.Grid.rowconfigure(self.window, row, weight=1)
+        for col in range(cols):
+            tk.Grid.columnconfigure(self.window, col, weight=1)
+
+    def layout(self):
+        """
+        Moves every cell item to the current cell size.
+        """
+        w, h = self.cell_width, self.cell_height
+        for i in range(self.rows * self.cols):
+            row, col = divmod(i, self.cols)
+            self.canvas.coords(self.rects[i], col * w, row * h, (col + 1) * w, (row + 1) * h)
+            self.canvas.coords(self.texts[i], (col + 0.5) * w, (row + 0.5) * h)
+        # negative sizes are pixels
+        self.font.configure(size=-max(8, int(min(w, h) * 0.6)))
+
+    def resize(self, event):
+        width = event.width / self.cols
+        height = event.height / self.rows
+        if (width, height) != (self.cell_width, self.cell_height):
+            self.cell_width, self.cell_height = width, height
+            self.layout()
+
+    def click(self, event):
+        row = int(event.y // self.cell_height)
+        col = int(event.x // self.cell_width)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self.on_click(row, col)
+
+    def draw(self, row, col, text, color, background):
+        """
+        Shows a cell's stone; "" for an empty cell. The canvas is updated
+        once Tk is idle.
+        """
+        self.set_cell(row * self.cols + col, (text, color, background))
+
+    def set_cell(self, i, look):
+        if self.cells[i] == look:
+            return
+        self.cells[i] = look
+        self.dirty.add(i)
+        if self.flush_pending is None:
+            self.flush_pending = self.window.after_idle(self.flush)
+
+    def flush(self):
+        """
+        Redraws the cells that changed since the last flush.
+        """
+        self.flush_pending = None
+        for i in self.dirty:
+            text, color, background = self.cells[i]
+            self.canvas.itemconfigure(self.rects[i], fill=background)
+            self.canvas.itemconfigure(self.texts[i], text=text, fill=color)
+        self.dirty.clear()
+
+    def destroy(self):
+        """
+        Removes the board from the window.
+        """
+        if self.flush_pending is not None:
+            self.window.after_cancel(self.flush_pending)
+        self.canvas.destroy()
+
+
+RENDERERS = {"buttons": ButtonRenderer, "canvas": CanvasRenderer}
+
+
+def create_renderer(name, window, rows, cols, on_click):
+    """
+    Creates a board renderer by name.
+
+    Parameters:
+    - name (str): "buttons" or "canvas".
+    - window (Tk): The game window.
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board.
+    - on_click (callable): Called with (row, col) when a cell is clicked.
+
+    Returns:
+    - object: The renderer.
+    """
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown renderer {name!r}: use one of {', '.join(RENDERERS)}.")
+    return RENDERERS[name](window, rows, cols, on_click)
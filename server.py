@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import OrderedDict, deque
+from game import Game, X, O, DRAW
+from instrument import percentile
+from move_parser import parser_for
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# sessions without a request for this many seconds are closed
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_MAX_SESSIONS = 100000
+EVICT_INTERVAL = 5.0
+MAX_BOARD_SIZE = 25
+LATENCY_SAMPLES = 10000
+
+STONE_NAMES = {X: "X", O: "O"}
+RESULT_NAMES = {X: "X", O: "O", DRAW: "draw"}
+
+
+class ProtocolError(Exception):
+    """
+    A request the server cannot serve; its message goes back to the client.
+    """
+
+
+class Session:
+    """
+    One hosted game.
+    """
+
+    __slots__ = ("game", "last_active")
+
+    def __init__(self, game, now):
+        self.game = game
+        self.last_active = now
+
+
+class GameServer:
+    """
+    Hosts many games in one process for clients speaking line-delimited
+    JSON over TCP.
+
+    Every request is one JSON object per line with an "op" and gets exactly
+    one JSON reply line with "ok":
+
+    - {"op": "new", "rows": 3, "cols": 3, "k": 3} -> {"ok": true, "game": id, ...}
+    - {"op": "move", "game": id, "row": 0, "col": 2}, or with "text":
+      "first row third column" instead of row and col; the text may also
+      say "undo" or "redo"
+    - {"op": "undo", "game": id} and {"op": "redo", "game": id}
+    - {"op": "state", "game": id}
+    - {"op": "close", "game": id}
+    - {"op": "stats"}
+
+    Games are not tied to a connection, so two clients can share one. Games
+    without a request for idle_timeout seconds are closed.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS):
+        """
+        Parameters:
+        - idle_timeout (float): Seconds after which an untouched game is closed.
+        - max_sessions (int): The most games hosted at once.
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        # least recently used first, so eviction stops at the first fresh game
+        self.sessions = OrderedDict()
+        self.ids = itertools.count(1)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.moves = 0
+        self.evicted = 0
+        self.connections = 0
+
+    ## Requests ##
+    def dispatch(self, request):
+        """
+        Serves one decoded request.
+
+        Returns:
+        - dict: The reply.
+        """
+        if type(request) is not dict:
+            raise ProtocolError("requests must be JSON objects")
+        op = request.get("op")
+        if op == "new":
+            return self.new_game(request)
+        if op == "stats":
+            return self.stats()
+        session = self.session(request)
+        if op == "move":
+            return self.move(session, request)
+        if op == "undo":
+            session.game.undo()
+            return self.state(session.game, request["game"])
+        if op == "redo":
+            session.game.redo()
+            return self.state(session.game, request["game"])
+        if op == "state":
+            return self.state(session.game, request["game"])
+        if op == "close":
+            del self.sessions[request["game"]]
+            return {"ok": True, "game": request["game"]}
+        raise ProtocolError(f"unknown op {op!r}")
+
+    def session(self, request):
+        """
+        Returns the session a request names and marks it as recently used.
+        """
+        game_id = request.get("game")
+        if type(game_id) not in (str, int):
+            raise ProtocolError(f"game ids are numbers, not {game_id!r}")
+        session = self.sessions.get(game_id)
+        if session is None:
+            raise ProtocolError(f"no game {request.get('game')!r}")
+        session.last_active = time.monotonic()
+        self.sessions.move_to_end(request["game"])
+        return session
+
+    def new_game(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise ProtocolError("server full")
+        try:
+            rows = int(request.get("rows", 3))
+            cols = int(request.get("cols", rows))
+            k = request.get("k")
+            k = None if k is None else int(k)
+        except (TypeError, ValueError, OverflowError):
+            # OverflowError: JSON allows Infinity
+            raise ProtocolError("rows, cols and k must be integers")
+        if not (1 <= rows <= MAX_BOARD_SIZE and 1 <= cols <= MAX_BOARD_SIZE):
+            raise ProtocolError(f"boards are 1 to {MAX_BOARD_SIZE} cells wide")
+        if k is not None and k < 1:
+            raise ProtocolError("k must be at least 1")
+        try:
+            game = Game(rows, cols, k)
+        except ValueError as e:
+            raise ProtocolError(str(e))
+        game_id = next(self.ids)
+        self.sessions[game_id] = Session(game, time.monotonic())
+        return self.state(game, game_id)
+
+    def move(self, session, request):
+        game = session.game
+        board = game.board
+        if "text" in request:
+            parser = parser_for(board.rows, board.cols)
+            text = str(request["text"])
+            command = parser.command(text)
+            if command == "undo":
+                game.undo()
+                return self.state(game, request["game"])
+            if command == "redo":
+                game.redo()
+                return self.state(game, request["game"])
+            row, col = parser.parse(text)
+            if row is None or col is None:
+                raise ProtocolError(f"no move in {request['text']!r}")
+        else:
+            row, col = request.get("row"), request.get("col")
+            if type(row) is not int or type(col) is not int:
+                raise ProtocolError("a move needs integer row and col, or text")
+        if not game.play_at(row, col):
+            raise ProtocolError(f"illegal move {row} {col}")
+        self.moves += 1
+        reply = {
+            "ok": True,
+            "game": request["game"],
+            "row": row,
+            "col": col,
+            "to_move": STONE_NAMES[game.to_move],
+            "winner": RESULT_NAMES.get(game.winner),
+        }
+        if game.winning_line:
+            reply["line"] = game.winning_line
+        return reply
+
+    @staticmethod
+    def state(game, game_id):
+        board = game.board
+        cells = "".join(".XO"[board.stone_at(i)] for i in range(board.size))
+        return {
+            "ok": True,
+            "game": game_id,
+            "rows": board.rows,
+            "cols": board.cols,
+            "k": board.k,
+            "board": cells,
+            "to_move": STONE_NAMES[game.to_move],
+            "winner": RESULT_NAMES.get(game.winner),
+        }
+
+    def stats(self):
+        """
+        Returns the session counts and the request latency percentiles.
+        """
+        reply = {
+            "ok": True,
+            "sessions": len(self.sessions),
+            "connections": self.connections,
+            "moves": self.moves,
+            "evicted": self.evicted,
+        }
+        if self.latencies:
+            samples = sorted(self.latencies)
+            for name, fraction in (("p50_us", 0.50), ("p95_us", 0.95), ("p99_us", 0.99)):
+                reply[name] = round(percentile(samples, fraction) * 1e6, 1)
+        return reply
+
+    ## Connections ##
+    async def handle(self, reader, writer):
+        """
+        Serves one client connection until it closes.
+        """
+        self.connections += 1
+        clock = time.perf_counter
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                started = clock()
+                try:
+                    reply = self.dispatch(json.loads(line))
+                except (ProtocolError, ValueError) as e:
+                    reply = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                self.latencies.append(clock() - started)
+                # wait for slow clients instead of buffering without bound
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # reset by the client, or a line longer than the stream limit
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def evict_idle(self):
+        """
+        Closes games that have been idle for longer than idle_timeout.
+        """
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            cutoff = time.monotonic() - self.idle_timeout
+            sessions = self.sessions
+            while sessions:
+                game_id, session = next(iter(sessions.items()))
+                if session.last_active > cutoff:
+                    break
+                del sessions[game_id]
+                self.evicted += 1
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        """
+        Accepts clients until cancelled.
+
+        Parameters:
+        - host (str): The address to listen on.
+        - port (int): The TCP port; 0 picks a free one.
+        - ready (callable): Called with the bound port once listening.
+        """
+        server = await asyncio.start_server(self.handle, host, port, limit=1 << 16)
+        evictor = asyncio.ensure_future(self.evict_idle())
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many tic-tac-toe games over line-delimited JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT, help="seconds")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    args = parser.parse_args()
+
+    server = GameServer(args.idle_timeout, args.max_sessions)
+    print(f"Serving on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats()))
@@ -0,0 +1,173 @@
+import argparse
+import json
+import numpy as np
+from board import default_win_length
+
+
+def random_policy(boards, stone, rng, shape):
+    """
+    Picks a uniformly random empty cell on every board.
+
+    Parameters:
+    - boards (np.ndarray): The (n_games, rows * cols) cells of the running games.
+    - stone (int): The stone to move, 1 for X and 2 for O.
+    - rng (np.random.Generator): The random generator.
+    - shape (tuple): The (rows, cols) of the board.
+
+    Returns:
+    - np.ndarray: One flat cell index per board.
+    """
+    scores = rng.random(boards.shape)
+    scores[boards != 0] = -1.0
+    return scores.argmax(axis=1)
+
+
+def center_policy(boards, stone, rng, shape):
+    """
+    Picks random empty cells, preferring those close to the center.
+    """
+    rows, cols = shape
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    distance = np.abs(row - (rows - 1) / 2) + np.abs(col - (cols - 1) / 2)
+    scores = rng.random(boards.shape) - distance
+    scores[boards != 0] = -np.inf
+    return scores.argmax(axis=1)
+
+
+POLICIES = {
+    "random": random_policy,
+    "center": center_policy,
+}
+
+
+def wins(boards, stone, k):
+    """
+    Detects k in a row for one stone on a whole batch of boards at once.
+
+    Every window is tested by AND-ing k shifted views of the stone mask, so
+    the work is a handful of array operations regardless of the batch size.
+
+    Parameters:
+    - boards (np.ndarray): The (n_games, rows, cols) cells.
+    - stone (int): The stone to test.
+    - k (int): The number of consecutive stones needed to win.
+
+    Returns:
+    - np.ndarray: A bool per board, True if the stone has k in a row.
+    """
+    stones = boards == stone
+    _, rows, cols = stones.shape
+    won = np.zeros(len(boards), dtype=bool)
+    if cols >= k:
+        horizontal = stones[:, :, : cols - k + 1].copy()
+        for i in range(1, k):
+            horizontal &= stones[:, :, i : cols - k + 1 + i]
+        won |= horizontal.any(axis=(1, 2))
+    if rows >= k:
+        vertical = stones[:, : rows - k + 1, :].copy()
+        for i in range(1, k):
+            vertical &= stones[:, i : rows - k + 1 + i, :]
+        won |= vertical.any(axis=(1, 2))
+    if rows >= k and cols >= k:
+        diagonal = stones[:, : rows - k + 1, : cols - k + 1].copy()
+        anti_diagonal = stones[:, : rows - k + 1, k - 1 :].copy()
+        for i in range(1, k):
+            diagonal &= stones[:, i : rows - k + 1 + i, i : cols - k + 1 + i]
+            anti_diagonal &= stones[:, i : rows - k + 1 + i, k - 1 - i : cols - i]
+        won |= diagonal.any(axis=(1, 2)) | anti_diagonal.any(axis=(1, 2))
+    return won
+
+
+def simulate(n_games, rows=3, k=None, policy="random", cols=None, seed=None):
+    """
+    Plays many games in lockstep and collects aggregate statistics.
+
+    All boards live in one (n_games, rows * cols) array; each ply asks the
+    policy for a move on every running board and checks the whole batch
+    for wins in one vectorized pass.
+
+    Parameters:
+    - n_games (int): The number of games to play.
+    - rows (int): The number of rows in the game board.
+    - k (int): The number of consecutive stones needed to win. Default
+      depends on the board size (see board.default_win_length).
+    - policy (str or callable): "random", "center", or a function taking
+      (boards, stone, rng, (rows, cols)) and returning one flat cell index
+      per board.
+    - cols (int): The number of columns in the game board. Default is rows.
+    - seed (int): The random seed.
+
+    Returns:
+    - dict: Win/draw rates, the game-length distribution and the X win rate
+      for each first move.
+    """
+    cols = cols or rows
+    k = k or default_win_length(rows, cols)
+    n_cells = rows * cols
+    choose = POLICIES[policy] if isinstance(policy, str) else policy
+    rng = np.random.default_rng(seed)
+
+    boards = np.zeros((n_games, n_cells), dtype=np.int8)
+    running = np.arange(n_games)
+    winner = np.zeros(n_games, dtype=np.int8)
+    length = np.full(n_games, n_cells, dtype=np.int64)
+    first_move = np.zeros(n_games, dtype=np.int64)
+
+    for ply in range(n_cells):
+        if len(running) == 0:
+            break
+        stone = 1 if ply % 2 == 0 else 2
+        active = boards[running]
+        moves = choose(active, stone, rng, (rows, cols))
+        active[np.arange(len(running)), moves] = stone
+        boards[running] = active
+        if ply == 0:
+            first_move[running] = moves
+
+        won = wins(active.reshape(-1, rows, cols), stone, k)
+        finished = running[won]
+        winner[finished] = stone
+        length[finished] = ply + 1
+        running = running[~won]
+
+    x_wins = winner == 1
+    o_wins = winner == 2
+    opening_games = np.bincount(first_move, minlength=n_cells)
+    opening_wins = np.bincount(first_move, weights=x_wins, minlength=n_cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        opening_rate = np.where(opening_games > 0, opening_wins / opening_games, np.nan)
+
+    return {
+        "games": n_games,
+        "rows": rows,
+        "cols": cols,
+        "k": k,
+        "x_win_rate": float(x_wins.mean()),
+        "o_win_rate": float(o_wins.mean()),
+        "draw_rate": float((winner == 0).mean()),
+        # how much more often the first player wins than the second
+        "first_move_advantage": float(x_wins.mean() - o_wins.mean()),
+        "mean_length": float(length.mean()),
+        "length_distribution": np.bincount(length, minlength=n_cells + 1).tolist(),
+        "x_win_rate_by_first_move": [
+            [None if np.isnan(rate) else round(float(rate), 4) for rate in row]
+            for row in opening_rate.reshape(rows, cols)
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched self-play statistics.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=None)
+    parser.add_argument("--k", type=int, default=None)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    print(
+        json.dumps(
+            simulate(args.games, args.rows, args.k, args.policy, args.cols, args.seed),
+            indent=2,
+        )
+    )
@@ -0,0 +1,394 @@
+import argparse
+import socket
+import struct
+import threading
+from collections import deque
+from board import Board, mask_cells
+from game import GameObserver, X, O, DRAW
+from record import write_varint, read_varint
+
+
+# frame types; every frame starts with the type byte and a varint sequence number
+KEYFRAME = 0
+MOVE = 1
+UNDO = 2
+GAME_OVER = 3
+# rows, cols, k, player to move and winner (0 while playing) of a keyframe
+KEYFRAME_HEADER = struct.Struct("<BBBBB")
+# a keyframe is published after this many deltas
+DEFAULT_KEYFRAME_INTERVAL = 32
+# frames a subscriber may fall behind before it is resynced from a keyframe
+DEFAULT_MAX_PENDING = 64
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+
+def encode_keyframe(sequence, game):
+    """
+    Returns a frame with the whole state of a game (or SpectatorView): the
+    board with 2 bits per cell, the player to move, the result and the
+    winning line.
+    """
+    board = game.board
+    out = bytearray((KEYFRAME,))
+    write_varint(out, sequence)
+    out += KEYFRAME_HEADER.pack(board.rows, board.cols, board.k, game.to_move, game.winner or 0)
+    cells = bytearray((board.size + 3) // 4)
+    for stone in (X, O):
+        for i in mask_cells(board.bits[stone]):
+            cells[i >> 2] |= stone << ((i & 3) << 1)
+    out += cells
+    write_varint(out, len(game.winning_line))
+    for i in game.winning_line:
+        write_varint(out, i)
+    return bytes(out)
+
+
+def encode_delta(kind, sequence, index):
+    out = bytearray((kind,))
+    write_varint(out, sequence)
+    write_varint(out, index)
+    return bytes(out)
+
+
+def encode_game_over(sequence, game):
+    out = bytearray((GAME_OVER,))
+    write_varint(out, sequence)
+    out.append(game.winner)
+    write_varint(out, len(game.winning_line))
+    for i in game.winning_line:
+        write_varint(out, i)
+    return bytes(out)
+
+
+class Subscription:
+    """
+    The frames waiting for one spectator.
+
+    When more than max_pending frames pile up, the backlog is replaced by a
+    keyframe of the current state, so a slow spectator skips ahead instead
+    of holding an ever longer queue.
+    """
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING):
+        self.max_pending = max_pending
+        self.frames = deque()
+        self.resyncs = 0
+        self.closed = False
+        self.ready = threading.Condition()
+
+    def push(self, frame, keyframe):
+        """
+        Queues a frame; keyframe returns the current state if the
+        subscriber has to be resynced.
+        """
+        with self.ready:
+            if len(self.frames) >= self.max_pending:
+                self.frames.clear()
+                self.frames.append(keyframe())
+                self.resyncs += 1
+            else:
+                self.frames.append(frame)
+            self.ready.notify()
+
+    def take(self, timeout=None):
+        """
+        Waits for frames and returns all of them, or [] on timeout or close.
+        """
+        with self.ready:
+            if not self.frames and not self.closed:
+                self.ready.wait(timeout)
+            frames = list(self.frames)
+            self.frames.clear()
+            return frames
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+
+
+class SpectatorFeed(GameObserver):
+    """
+    Publishes a game to spectators as delta frames.
+
+    Every move, undo and result becomes one small delta and a rematch or
+    resize becomes a keyframe; every keyframe_interval deltas a keyframe is
+    sent as well. Each frame is encoded once and the same bytes go to every
+    subscriber. A new subscriber starts from a keyframe of the current state,
+    which is cached until the next event.
+
+    Keyframes are encoded from a SpectatorView fed with the published
+    frames rather than from the game, so a spectator joining from another
+    thread never sees a move before its frame.
+    """
+
+    def __init__(self, game, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, max_pending=DEFAULT_MAX_PENDING):
+        """
+        Attaches the feed to a game.
+
+        Parameters:
+        - game (Game): The game to publish.
+        - keyframe_interval (int): Deltas between two keyframes.
+        - max_pending (int): Frames a subscriber may fall behind before it
+          is resynced from a keyframe.
+        """
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.max_pending = max_pending
+        self.sequence = 0
+        self.deltas = 0
+        self.cached_keyframe = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.view = SpectatorView()
+        self.view.apply(encode_keyframe(0, game))
+        game.add_observer(self)
+
+    ## Subscribers ##
+    def subscribe(self):
+        """
+        Returns a new Subscription holding a keyframe of the current state.
+        """
+        subscription = Subscription(self.max_pending)
+        with self.lock:
+            subscription.push(self.keyframe(), self.keyframe)
+            self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+        subscription.close()
+
+    def keyframe(self):
+        """
+        Returns the keyframe of the current state, encoding it at most once
+        per event.
+        """
+        if self.cached_keyframe is None:
+            self.cached_keyframe = encode_keyframe(self.sequence, self.view)
+        return self.cached_keyframe
+
+    ## Publishing ##
+    def publish(self, encode):
+        """
+        Numbers, encodes and fans out one frame.
+
+        Parameters:
+        - encode (callable): Builds the frame bytes from the sequence number.
+        """
+        with self.lock:
+            self.sequence += 1
+            self.cached_keyframe = None
+            frame = encode(self.sequence)
+            self.view.apply(frame)
+            if frame[0] == KEYFRAME:
+                self.cached_keyframe = frame
+                self.deltas = 0
+            else:
+                self.deltas += 1
+            for subscription in self.subscribers:
+                subscription.push(frame, self.keyframe)
+            if self.deltas >= self.keyframe_interval:
+                self.sequence += 1
+                self.cached_keyframe = None
+                frame = self.keyframe()
+                self.view.apply(frame)
+                self.deltas = 0
+                for subscription in self.subscribers:
+                    subscription.push(frame, self.keyframe)
+
+    ## Game events ##
+    def on_move(self, game, index, stone):
+        self.publish(lambda sequence: encode_delta(MOVE, sequence, index))
+
+    def on_undo(self, game, index, stone):
+        self.publish(lambda sequence: encode_delta(UNDO, sequence, index))
+
+    def on_game_over(self, game):
+        self.publish(lambda sequence: encode_game_over(sequence, game))
+
+    def on_reset(self, game):
+        self.publish(lambda sequence: encode_keyframe(sequence, game))
+
+
+class SpectatorView:
+    """
+    A spectator's copy of the game, rebuilt from frames.
+
+    Deltas are only applied in sequence; after a gap the view waits for the
+    next keyframe.
+    """
+
+    def __init__(self):
+        self.board = None
+        self.to_move = X
+        self.winner = None
+        self.winning_line = []
+        self.sequence = None
+
+    def apply(self, frame):
+        """
+        Applies one frame.
+
+        Returns:
+        - bool: True if the view changed.
+        """
+        kind = frame[0]
+        sequence, offset = read_varint(frame, 1)
+        if kind == KEYFRAME:
+            rows, cols, k, to_move, winner = KEYFRAME_HEADER.unpack_from(frame, offset)
+            offset += KEYFRAME_HEADER.size
+            self.board = Board(rows, cols, k)
+            for i in range(self.board.size):
+                stone = frame[offset + (i >> 2)] >> ((i & 3) << 1) & 3
+                if stone:
+                    self.board.place(i, stone)
+            offset += (self.board.size + 3) // 4
+            self.to_move = to_move
+            self.winner = winner or None
+            self.winning_line = self.read_cells(frame, offset)
+            self.sequence = sequence
+            return True
+        if self.sequence is None or sequence != self.sequence + 1:
+            return False
+        self.sequence = sequence
+        if kind == MOVE:
+            index, _ = read_varint(frame, offset)
+            self.board.place(index, self.to_move)
+            self.to_move = O if self.to_move == X else X
+        elif kind == UNDO:
+            index, _ = read_varint(frame, offset)
+            self.board.remove(index)
+            self.to_move = O if self.to_move == X else X
+            self.winner = None
+            self.winning_line = []
+        elif kind == GAME_OVER:
+            self.winner = frame[offset]
+            self.winning_line = self.read_cells(frame, offset + 1)
+        return True
+
+    @staticmethod
+    def read_cells(frame, offset):
+        count, offset = read_varint(frame, offset)
+        cells = []
+        for _ in range(count):
+            cell, offset = read_varint(frame, offset)
+            cells.append(cell)
+        return cells
+
+    def render(self):
+        """
+        Returns the board as text, the winning line in lower case.
+        """
+        if self.board is None:
+            return ""
+        board = self.board
+        lines = []
+        for row in range(board.rows):
+            chars = []
+            for col in range(board.cols):
+                i = board.index(row, col)
+                char = ".XO"[board.stone_at(i)]
+                chars.append(char.lower() if i in self.winning_line else char)
+            lines.append(" ".join(chars))
+        if self.winner == DRAW:
+            lines.append("Draw")
+        elif self.winner:
+            lines.append(f"{'.XO'[self.winner]} wins")
+        else:
+            lines.append(f"{'.XO'[self.to_move]} to move")
+        return "\n".join(lines)
+
+
+class SpectatorServer:
+    """
+    Streams a SpectatorFeed to TCP clients, each frame prefixed with its
+    length as a varint. Every client gets its own subscription and sender
+    thread, so a slow one only delays itself.
+    """
+
+    def __init__(self, feed, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Starts listening in the background.
+
+        Parameters:
+        - feed (SpectatorFeed): The game to stream.
+        - host (str): The address to listen on.
+        - port (int): The TCP port; 0 picks a free one.
+        """
+        self.feed = feed
+        self.listener = socket.create_server((host, port))
+        self.port = self.listener.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while self.running:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.send, args=(client,), daemon=True).start()
+
+    def send(self, client):
+        subscription = self.feed.subscribe()
+        try:
+            while self.running and not subscription.closed:
+                out = bytearray()
+                for frame in subscription.take(timeout=1.0):
+                    write_varint(out, len(frame))
+                    out += frame
+                if out:
+                    client.sendall(out)
+        except OSError:
+            pass
+        finally:
+            self.feed.unsubscribe(subscription)
+            client.close()
+
+    def close(self):
+        self.running = False
+        self.listener.close()
+        with self.feed.lock:
+            subscribers = list(self.feed.subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+
+def read_frames(sock):
+    """
+    Yields the frames sent by a SpectatorServer until it disconnects.
+    """
+    data = bytearray()
+    while True:
+        chunk = sock.recv(1 << 16)
+        if not chunk:
+            return
+        data += chunk
+        offset = 0
+        while offset < len(data):
+            try:
+                length, start = read_varint(data, offset)
+            except IndexError:
+                break
+            if start + length > len(data):
+                break
+            yield bytes(data[start:start + length])
+            offset = start + length
+        del data[:offset]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a game started with main.py --spectate.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    view = SpectatorView()
+    with socket.create_connection((args.host, args.port)) as sock:
+        for frame in read_frames(sock):
+            if view.apply(frame):
+                print(view.render(), end="\n\n", flush=True)
@@ -0,0 +1,586 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+import speech_recognition as sr
+from move_parser import number_words, ROW_WORDS, COLUMN_WORDS, MIDDLE_WORDS, EDGE_WORDS, HISTORY_WORDS
+from util import Messages
+
+
+# sample rate the offline engine expects
+VOSK_SAMPLE_RATE = 16000
+# words besides numbers that the offline grammar accepts
+COMMAND_WORDS = ("and", "the", "in", "corner") + tuple(HISTORY_WORDS)
+
+# speech pipeline limits
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 4
+DEFAULT_MAX_MOVES = 4
+# utterances older than this are dropped instead of played
+DEFAULT_MAX_AGE = 4.0
+LATENCY_SAMPLES = 1000
+
+# ambient noise calibration of the microphone
+CALIBRATION_SECONDS = 0.5
+DEFAULT_CALIBRATION_INTERVAL = 60.0
+# seconds of silence after which listening checks whether to recalibrate
+LISTEN_TIMEOUT = 3.0
+
+
+def move_grammar(rows, cols):
+    """
+    Returns the vocabulary of move commands for a board size, so an offline
+    engine only has to choose between words that can form a move.
+    """
+    limit = max(rows, cols)
+    words = {word for word, n in number_words().items() if n <= limit}
+    words |= ROW_WORDS | COLUMN_WORDS | MIDDLE_WORDS | set(EDGE_WORDS) | set(COMMAND_WORDS)
+    return sorted(words) + ["[unk]"]
+
+
+class RecognizerBackend:
+    """
+    A speech engine behind the speech input.
+
+    Subclasses implement transcribe for whole utterances. Engines that can
+    decode audio as it arrives also set streaming and implement new_decoder
+    and decode.
+    """
+
+    name = "speech engine"
+    streaming = False
+
+    def __init__(self):
+        """
+        Initializes the latency log, which keeps the last LATENCY_SAMPLES
+        recognitions.
+        """
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def recognize(self, recognizer, audio):
+        """
+        Transcribes one utterance and records how long it took.
+
+        Parameters:
+        - recognizer (Recognizer): The speech_recognition recognizer.
+        - audio (AudioData): The utterance.
+
+        Returns:
+        - str: The transcript.
+
+        Raises:
+        - sr.UnknownValueError: If nothing intelligible was said.
+        - sr.RequestError: If the engine is unavailable.
+        """
+        started = time.perf_counter()
+        try:
+            return self.transcribe(recognizer, audio)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def transcribe(self, recognizer, audio):
+        """
+        Engine-specific transcription; see recognize.
+        """
+        raise NotImplementedError
+
+    def set_board(self, rows, cols):
+        """
+        Adapts the engine to a new board size. Engines without a grammar
+        ignore this.
+        """
+
+    def last_latency(self):
+        """
+        Returns the seconds the last utterance took to recognize, or None.
+        """
+        return self.latencies[-1] if self.latencies else None
+
+
+class GoogleBackend(RecognizerBackend):
+    """
+    The Google Web Speech API; needs a network connection.
+    """
+
+    name = "Google Speech Recognition"
+
+    def transcribe(self, recognizer, audio):
+        return recognizer.recognize_google(audio)
+
+
+class VoskBackend(RecognizerBackend):
+    """
+    The offline Vosk engine restricted to the move-command grammar.
+
+    The model is read from VOSK_MODEL_PATH, or the small English model that
+    vosk keeps in its own cache.
+    """
+
+    name = "Vosk (offline)"
+    streaming = True
+
+    def __init__(self, rows, cols, model_path=None):
+        """
+        Loads the model and builds the grammar for a board size.
+
+        Parameters:
+        - rows (int): The number of rows in the game board.
+        - cols (int): The number of columns in the game board.
+        - model_path (str): The model directory. Default is VOSK_MODEL_PATH.
+        """
+        super().__init__()
+        try:
+            import vosk
+        except ImportError as e:
+            raise sr.RequestError("the offline engine needs the vosk package") from e
+        vosk.SetLogLevel(-1)
+        model_path = model_path or os.environ.get("VOSK_MODEL_PATH")
+        self.model = vosk.Model(model_path) if model_path else vosk.Model(lang="en-us")
+        self.vosk = vosk
+        self.set_board(rows, cols)
+
+    def set_board(self, rows, cols):
+        """
+        Restricts the grammar to the numbers that fit on the board. Decoders
+        created afterwards use the new grammar.
+        """
+        self.grammar = json.dumps(move_grammar(rows, cols))
+
+    def new_decoder(self):
+        """
+        Returns a fresh decoder limited to the grammar.
+        """
+        return self.vosk.KaldiRecognizer(self.model, VOSK_SAMPLE_RATE, self.grammar)
+
+    def transcribe(self, recognizer, audio):
+        decoder = self.new_decoder()
+        decoder.AcceptWaveform(audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+        text = json.loads(decoder.FinalResult()).get("text", "").replace("[unk]", "").strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def decode(self, decoder, chunk):
+        """
+        Feeds raw 16 kHz 16-bit mono audio to a decoder.
+
+        Returns:
+        - tuple: (text so far, final) where final is True at the end of an
+          utterance, after which the decoder starts afresh.
+        """
+        if decoder.AcceptWaveform(chunk):
+            text, final = json.loads(decoder.Result()).get("text", ""), True
+        else:
+            text, final = json.loads(decoder.PartialResult()).get("partial", ""), False
+        return text.replace("[unk]", "").strip(), final
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "vosk": VoskBackend,
+}
+
+
+def create_backend(name, rows, cols):
+    """
+    Creates a speech engine by name.
+
+    Parameters:
+    - name (str): "google" or "vosk".
+    - rows (int): The number of rows in the game board.
+    - cols (int): The number of columns in the game board.
+
+    Returns:
+    - RecognizerBackend: The engine.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech engine {name!r}: use one of {', '.join(BACKENDS)}.")
+    if name == "vosk":
+        return VoskBackend(rows, cols)
+    return BACKENDS[name]()
+
+
+class AudioSession:
+    """
+    Keeps the microphone open for the whole app, so switching to speech
+    input or starting a rematch does not reopen or recalibrate it.
+
+    One background thread owns the stream. It calibrates for ambient noise
+    before the first utterance and again after a quiet spell once the
+    calibration is older than calibration_interval, so the Tk thread never
+    waits for it. While paused, the audio is read and thrown away.
+    """
+
+    def __init__(self, backend, pipeline, callback=None, calibration_interval=DEFAULT_CALIBRATION_INTERVAL):
+        """
+        Opens the microphone and starts listening.
+
+        Parameters:
+        - backend (RecognizerBackend): The speech engine.
+        - pipeline (SpeechPipeline): Receives whole utterances.
+        - callback (callable): For streaming engines, called with every
+          (text, final, seconds since the first word of the utterance). When
+          it returns True (a full move was recognized) the rest of the
+          utterance is dropped.
+        - calibration_interval (float): Seconds after which the ambient noise
+          level is measured again.
+        """
+        self.backend = backend
+        self.pipeline = pipeline
+        self.callback = callback
+        self.calibration_interval = calibration_interval
+        self.calibrated_at = None
+        self.recognizer = sr.Recognizer()
+        if backend.streaming:
+            self.microphone = sr.Microphone(sample_rate=VOSK_SAMPLE_RATE)
+        else:
+            self.microphone = sr.Microphone()
+        self.running = threading.Event()
+        self.running.set()
+        self.listening = threading.Event()
+        self.listening.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    ## Control ##
+    def pause(self):
+        """
+        Stops turning audio into moves, keeping the microphone open.
+        """
+        self.listening.clear()
+        self.pipeline.cancel()
+
+    def resume(self):
+        """
+        Turns audio into moves again.
+        """
+        self.listening.set()
+
+    def set_board(self, rows, cols):
+        """
+        Tells the speech engine about a new board size.
+        """
+        self.backend.set_board(rows, cols)
+
+    def close(self, wait_for_stop=False):
+        """
+        Closes the microphone and stops the pipeline.
+        """
+        self.running.clear()
+        self.listening.clear()
+        self.pipeline.stop()
+        if wait_for_stop:
+            self.thread.join()
+
+    ## Listening ##
+    def run(self):
+        with self.microphone as source:
+            if self.backend.streaming:
+                self.stream(source)
+            else:
+                self.listen(source)
+
+    def calibrate(self, source):
+        self.recognizer.adjust_for_ambient_noise(source, duration=CALIBRATION_SECONDS)
+        self.calibrated_at = time.perf_counter()
+
+    def listen(self, source):
+        """
+        Hands whole utterances to the pipeline.
+        """
+        while self.running.is_set():
+            if not self.listening.is_set():
+                source.stream.read(source.CHUNK)
+                continue
+            if self.calibrated_at is None:
+                self.calibrate(source)
+            try:
+                audio = self.recognizer.listen(source, timeout=LISTEN_TIMEOUT)
+            except sr.WaitTimeoutError:
+                # a quiet spell is a good time to measure the noise again
+                if time.perf_counter() - self.calibrated_at > self.calibration_interval:
+                    self.calibrate(source)
+                continue
+            if self.listening.is_set():
+                self.pipeline.submit(self.recognizer, audio)
+
+    def stream(self, source):
+        """
+        Feeds the audio to a streaming engine as it arrives.
+        """
+        decoder = self.backend.new_decoder()
+        started = None
+        paused = False
+        while self.running.is_set():
+            chunk = source.stream.read(source.CHUNK)
+            if not self.listening.is_set():
+                paused = True
+                continue
+            if paused:
+                # start afresh instead of finishing an utterance from before the pause
+                decoder, started, paused = self.backend.new_decoder(), None, False
+            text, final = self.backend.decode(decoder, chunk)
+            if not text:
+                continue
+            # latency counts from the first recognized word
+            if started is None:
+                started = time.perf_counter()
+            latency = time.perf_counter() - started
+            if self.callback(text, final, latency) or final:
+                self.backend.latencies.append(latency)
+                started = None
+                # drop the rest of the utterance and pick up grammar changes
+                decoder = self.backend.new_decoder()
+
+
+class StageStats:
+    """
+    Latency samples of one pipeline stage, keeping the most recent ones.
+    """
+
+    def __init__(self, size=LATENCY_SAMPLES):
+        self.count = 0
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.count += 1
+        self.samples.append(seconds)
+
+    def summary(self):
+        """
+        Returns the count and p50/p95 of the recent samples in milliseconds.
+        """
+        if not self.samples:
+            return f"{self.count:6d}"
+        ordered = sorted(self.samples)
+        p50 = ordered[len(ordered) // 2] * 1000
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+        return f"{self.count:6d}  p50 {p50:7.1f} ms  p95 {p95:7.1f} ms"
+
+
+class SpeechPipeline:
+    """
+    Turns captured utterances into moves in stages: a bounded audio queue,
+    a fixed pool of recognition workers that also parse the transcript, and
+    a bounded move queue that the Tk thread drains with drain().
+
+    Every utterance is tagged with the turn it was captured on and the
+    pipeline generation; moves for a turn that has already been played, or
+    from before cancel(), are dropped instead of played late. When a queue
+    is full the oldest entry makes room for the newest.
+    """
+
+    def __init__(
+        self,
+        backend,
+        parse,
+        turn,
+        workers=DEFAULT_WORKERS,
+        max_pending=DEFAULT_MAX_PENDING,
+        max_moves=DEFAULT_MAX_MOVES,
+        max_age=DEFAULT_MAX_AGE,
+        metrics=None,
+        parse_partial=None,
+    ):
+        """
+        Starts the recognition workers.
+
+        Parameters:
+        - backend (RecognizerBackend): The speech engine.
+        - parse (callable): Turns a transcript into (row, col), or into a
+          command word such as "undo".
+        - turn (callable): Returns the current turn number (moves played).
+        - workers (int): Recognitions that may run at the same time.
+        - max_pending (int): Utterances that may wait for a worker.
+        - max_moves (int): Parsed moves that may wait for the Tk thread.
+        - max_age (float): Seconds after capture when an utterance goes stale.
+        - metrics (instrument.Metrics): Also records every recognition
+          round-trip and capture-to-play latency there.
+        - parse_partial (callable): Like parse, for partial transcripts of
+          streaming engines; it should only return a move the rest of the
+          utterance cannot change. Default is parse.
+        """
+        self.backend = backend
+        self.metrics = metrics
+        self.parse = parse
+        self.parse_partial = parse_partial or parse
+        self.turn = turn
+        self.max_age = max_age
+        self.audio = queue.Queue(max_pending)
+        self.moves = queue.Queue(max_moves)
+        self.generation = 0
+        self.sequence = itertools.count()
+        self.running = threading.Event()
+        self.running.set()
+        self.stages = {
+            name: StageStats() for name in ("audio queue", "recognition", "parse", "move queue", "total")
+        }
+        self.counters = dict.fromkeys(
+            ("captured", "played", "unrecognized", "invalid", "dropped full", "dropped stale", "dropped out of turn"),
+            0,
+        )
+        self.lock = threading.Lock()
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def offer(self, target, item):
+        """
+        Puts an item on a bounded queue, dropping the oldest one when full.
+        """
+        while True:
+            try:
+                target.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    target.get_nowait()
+                    self.count("dropped full")
+                except queue.Empty:
+                    pass
+
+    ## Stages ##
+    def submit(self, recognizer, audio):
+        """
+        Capture stage: queues an utterance. Safe to call from the listening
+        thread.
+        """
+        self.count("captured")
+        self.offer(
+            self.audio,
+            (next(self.sequence), self.generation, self.turn(), time.perf_counter(), recognizer, audio),
+        )
+
+    def work(self):
+        """
+        Recognition worker: transcribes and parses queued utterances.
+        """
+        while self.running.is_set():
+            try:
+                sequence, generation, turn, captured, recognizer, audio = self.audio.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            self.stages["audio queue"].add(started - captured)
+            if not self.is_current(generation, turn, captured):
+                continue
+            try:
+                speech = self.backend.recognize(recognizer, audio)
+            except sr.UnknownValueError:
+                self.count("unrecognized")
+                print(Messages.SPEECH_UNKNOWN_ERROR.value.format(self.backend.name))
+                continue
+            except sr.RequestError as e:
+                self.count("unrecognized")
+                print(Messages.SPEECH_REQUEST_ERROR.value.format(self.backend.name, e))
+                continue
+            finally:
+                # the round-trip counts whether or not anything was understood
+                if self.metrics is not None:
+                    self.metrics.observe("speech recognition", time.perf_counter() - started)
+            recognized = time.perf_counter()
+            self.stages["recognition"].add(recognized - started)
+            print(Messages.SPEECH_RESULT.value.format(self.backend.name, speech, (recognized - started) * 1000))
+            self.push_text(speech, sequence, generation, turn, captured, final=True)
+
+    def push_text(self, speech, sequence=None, generation=None, turn=None, captured=None, final=True):
+        """
+        Parse stage: queues the move or command named by a transcript.
+        Streaming engines call this directly with their partial transcripts.
+
+        Returns:
+        - bool: True if the transcript named a full move or a command.
+        """
+        started = time.perf_counter()
+        if sequence is None:
+            sequence, generation, turn, captured = next(self.sequence), self.generation, self.turn(), started
+        action = self.parse(speech) if final else self.parse_partial(speech)
+        self.stages["parse"].add(time.perf_counter() - started)
+        if type(action) is not str and (action[0] is None or action[1] is None):
+            if final:
+                self.count("invalid")
+                print("Invalid move!", Messages.WARNING_SPEECH.value)
+            return False
+        self.offer(self.moves, (sequence, generation, turn, captured, time.perf_counter(), action))
+        return True
+
+    def drain(self, play):
+        """
+        Tk stage: plays the queued moves and commands that are still
+        current and drops everything stale. Call it from the Tk thread only.
+
+        Parameters:
+        - play (callable): Plays what parse returned, a (row, col) tuple or
+          a command word.
+        """
+        ready = []
+        while True:
+            try:
+                ready.append(self.moves.get_nowait())
+            except queue.Empty:
+                break
+        # workers may finish out of order; play in the order things were said
+        ready.sort()
+        now = time.perf_counter()
+        for sequence, generation, turn, captured, queued, action in ready:
+            if not self.is_current(generation, turn, captured):
+                continue
+            self.stages["move queue"].add(now - queued)
+            self.stages["total"].add(now - captured)
+            if self.metrics is not None:
+                self.metrics.observe("speech capture to play", now - captured)
+            self.count("played")
+            play(action)
+
+    def is_current(self, generation, turn, captured):
+        """
+        Returns True if an utterance may still be played, counting why not.
+        """
+        if generation != self.generation or time.perf_counter() - captured > self.max_age:
+            self.count("dropped stale")
+            return False
+        if turn != self.turn():
+            self.count("dropped out of turn")
+            return False
+        return True
+
+    ## Control ##
+    def cancel(self):
+        """
+        Drops every utterance and move in flight, e.g. for a rematch.
+        """
+        self.generation += 1
+        for target in (self.audio, self.moves):
+            while True:
+                try:
+                    target.get_nowait()
+                except queue.Empty:
+                    break
+
+    def stop(self):
+        """
+        Stops the recognition workers.
+        """
+        self.cancel()
+        self.running.clear()
+
+    def report(self):
+        """
+        Returns the per-stage latencies and counters as text.
+        """
+        lines = ["Speech pipeline:"]
+        for name, stats in self.stages.items():
+            lines.append(f"  {name:<14}{stats.summary()}")
+        last = self.backend.last_latency()
+        if last is not None:
+            lines.append(f"  {'last recognition':<20}{last * 1000:6.1f} ms")
+        for name, value in self.counters.items():
+            lines.append(f"  {name:<20}{value:6d}")
+        return "\n".join(lines)
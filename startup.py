@@ -0,0 +1,67 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase takes.
+
+    Attributes:
+    - start (float): perf_counter() when this module was first imported.
+    - phases (list): (name, seconds) for every timed phase, in order.
+    - milestones (list): (name, seconds since start) for every milestone.
+    - exit_after_first_window (bool): Close the first window as soon as it
+      is shown, for scripted startup measurements.
+    """
+
+    def __init__(self):
+        """
+        Starts the clock.
+        """
+        self.start = time.perf_counter()
+        self.phases = []
+        self.milestones = []
+        self.exit_after_first_window = False
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the enclosed block, e.g. a group of imports.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def mark(self, name):
+        """
+        Records a milestone such as the first window being shown.
+        """
+        self.milestones.append((name, time.perf_counter() - self.start))
+
+    def elapsed(self, name):
+        """
+        Returns the seconds from start to the named milestone, or None.
+        """
+        for milestone, seconds in self.milestones:
+            if milestone == name:
+                return seconds
+        return None
+
+    def report(self):
+        """
+        Returns the phases and milestones as text.
+        """
+        width = max([len(name) for name, _ in self.phases + self.milestones] + [10]) + 2
+        lines = ["Startup phases:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<{width}}{seconds * 1000:8.1f} ms")
+        lines.append("Milestones (since start):")
+        for name, seconds in self.milestones:
+            lines.append(f"  {name:<{width}}{seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+# shared by every module that wants to time its part of startup
+STARTUP = StartupTimer()
@@ -0,0 +1,24 @@
+from move_parser import parser_for
+
+
+def test_middle_row_then_column():
+    assert parser_for(3, 3).parse("middle row third column") == (1, 2)
+
+
+def test_column_then_middle_row():
+    assert parser_for(3, 3).parse("third column middle row") == (1, 2)
+
+
+def test_keyword_orders():
+    parser = parser_for(3, 3)
+    assert parser.parse("row 2 column 3") == (1, 2)
+    assert parser.parse("2nd row 3rd column") == (1, 2)
+    assert parser.parse("top row third column") == (0, 2)
+    assert parser.parse("bottom middle") == (2, 1)
+
+
+def test_explicit_ignores_place_words():
+    parser = parser_for(3, 3)
+    assert parser.parse("middle row third column", explicit=True) == (None, 2)
+    assert parser.parse("middle", explicit=True) == (None, None)
+    assert parser.parse("row 2 column 3", explicit=True) == (1, 2)
@@ -0,0 +1,36 @@
+import asyncio
+import json
+from server import GameServer
+
+
+async def exchange(lines):
+    """
+    Sends raw request lines to a fresh server and returns the replies.
+    """
+    server = GameServer()
+    ready = asyncio.get_running_loop().create_future()
+    serving = asyncio.ensure_future(server.serve("127.0.0.1", 0, ready.set_result))
+    port = await ready
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        replies = []
+        for line in lines:
+            writer.write(line.encode() + b"\n")
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        return replies
+    finally:
+        serving.cancel()
+
+
+def test_infinite_size_is_an_error_reply():
+    replies = asyncio.run(
+        exchange(['{"op": "new", "rows": Infinity}', '{"op": "new", "k": -Infinity}', '{"op": "new"}'])
+    )
+    assert [reply["ok"] for reply in replies] == [False, False, True]
+    assert replies[0]["error"] == "rows, cols and k must be integers"
+
+
+def test_bad_game_ids_and_k():
+    replies = asyncio.run(exchange(['{"op": "state", "game": [1]}', '{"op": "new", "k": 0}']))
+    assert [reply["ok"] for reply in replies] == [False, False]
@@ -0,0 +1,269 @@
+from functools import lru_cache
+from board import win_masks, mask_cells
+from game import GameObserver
+
+
+# candidate moves must lie within this many cells of a stone
+DEFAULT_RADIUS = 2
+# ordering bonus of a move that creates two threats at once
+FORK_BONUS = 1 << 30
+
+
+@lru_cache(maxsize=None)
+def windows(rows, cols, k):
+    """
+    Returns the k-windows of a board as cell lists.
+
+    Returns:
+    - tuple: (cells of every window, window ids through every cell)
+    """
+    masks, _ = win_masks(rows, cols, k)
+    window_cells = tuple(tuple(mask_cells(mask)) for mask in masks)
+    cell_windows = [[] for _ in range(rows * cols)]
+    for w, cells in enumerate(window_cells):
+        for cell in cells:
+            cell_windows[cell].append(w)
+    return window_cells, tuple(tuple(ids) for ids in cell_windows)
+
+
+@lru_cache(maxsize=None)
+def neighbors(rows, cols, radius):
+    """
+    Returns, for every cell, the other cells within radius in any direction.
+    """
+    result = []
+    for row in range(rows):
+        for col in range(cols):
+            result.append(
+                tuple(
+                    r * cols + c
+                    for r in range(max(0, row - radius), min(rows, row + radius + 1))
+                    for c in range(max(0, col - radius), min(cols, col + radius + 1))
+                    if (r, c) != (row, col)
+                )
+            )
+    return tuple(result)
+
+
+class ThreatTracker(GameObserver):
+    """
+    Per-window stone counts of a board, updated move by move, for move
+    generation on large boards.
+
+    From the counts it keeps every threat (a window one stone short of a
+    win whose last cell is empty) and, given window weights, the heuristic
+    score of ai.evaluate, so neither needs a scan of the board. It also
+    counts the stones near every cell so candidates can skip far-off cells.
+
+    Attach it to a Game as an observer, or drive it with place and remove
+    alongside the board in a search.
+    """
+
+    def __init__(self, board, radius=DEFAULT_RADIUS, weights=None):
+        """
+        Builds the tables for a board and its current stones.
+
+        Parameters:
+        - board (Board): The position to start from.
+        - radius (int): Candidate moves lie within this distance of a stone.
+        - weights (tuple): Weight of a window by its stone count; enables
+          evaluate. See ai.WINDOW_WEIGHTS.
+        """
+        self.weights = weights
+        self.radius = radius
+        self.reset(board)
+
+    def reset(self, board):
+        """
+        Rebuilds every table for a board.
+        """
+        self.rows, self.cols, self.k = board.rows, board.cols, board.k
+        self.size = board.size
+        self.window_cells, self.cell_windows = windows(board.rows, board.cols, board.k)
+        self.neighbors = neighbors(board.rows, board.cols, self.radius)
+        count = len(self.window_cells)
+        self.counts = [None, [0] * count, [0] * count]
+        self.stones = [0] * self.size
+        self.near = [0] * self.size
+        # stone -> {empty cell: windows it would complete}
+        self.threats = [None, {}, {}]
+        # evaluate() from X's point of view
+        self.score = 0
+        self.placed = 0
+        for i in range(board.size):
+            stone = board.stone_at(i)
+            if stone:
+                self.place(i, stone)
+
+    ## Updates ##
+    def window_value(self, w):
+        x, o = self.counts[1][w], self.counts[2][w]
+        if x and not o:
+            return self.weights[min(x, 7)]
+        if o and not x:
+            return -self.weights[min(o, 7)]
+        return 0
+
+    def other_empty(self, w, i):
+        """
+        Returns the empty cell of window w other than i.
+        """
+        stones = self.stones
+        for cell in self.window_cells[w]:
+            if cell != i and not stones[cell]:
+                return cell
+        return None
+
+    def add_threat(self, stone, cell):
+        threats = self.threats[stone]
+        threats[cell] = threats.get(cell, 0) + 1
+
+    def drop_threat(self, stone, cell):
+        threats = self.threats[stone]
+        if threats[cell] == 1:
+            del threats[cell]
+        else:
+            threats[cell] -= 1
+
+    def place(self, i, stone):
+        """
+        Records a stone placed on cell i.
+        """
+        self.stones[i] = stone
+        self.placed += 1
+        near = self.near
+        for n in self.neighbors[i]:
+            near[n] += 1
+        own, other = self.counts[stone], self.counts[3 - stone]
+        threat = self.k - 1
+        scored = self.weights is not None
+        for w in self.cell_windows[i]:
+            if scored:
+                self.score -= self.window_value(w)
+            mine, theirs = own[w], other[w]
+            if not theirs:
+                if mine == threat:
+                    # i was the winning cell and is now taken
+                    self.drop_threat(stone, i)
+                elif mine == threat - 1:
+                    self.add_threat(stone, self.other_empty(w, i))
+            elif not mine and theirs == threat:
+                # blocked
+                self.drop_threat(3 - stone, i)
+            own[w] = mine + 1
+            if scored:
+                self.score += self.window_value(w)
+
+    def remove(self, i, stone):
+        """
+        Records the stone on cell i being taken back.
+        """
+        self.stones[i] = 0
+        self.placed -= 1
+        near = self.near
+        for n in self.neighbors[i]:
+            near[n] -= 1
+        own, other = self.counts[stone], self.counts[3 - stone]
+        threat = self.k - 1
+        scored = self.weights is not None
+        for w in self.cell_windows[i]:
+            if scored:
+                self.score -= self.window_value(w)
+            mine, theirs = own[w] - 1, other[w]
+            own[w] = mine
+            if not theirs:
+                if mine == threat:
+                    self.add_threat(stone, i)
+                elif mine == threat - 1:
+                    self.drop_threat(stone, self.other_empty(w, i))
+            elif not mine and theirs == threat:
+                self.add_threat(3 - stone, i)
+            if scored:
+                self.score += self.window_value(w)
+
+    ## Queries ##
+    def evaluate(self, stone):
+        """
+        Returns ai.evaluate of the current position for stone.
+        """
+        return self.score if stone == 1 else -self.score
+
+    def winning_cells(self, stone):
+        """
+        Returns the empty cells where stone wins at once.
+        """
+        return list(self.threats[stone])
+
+    def is_fork(self, cell, stone):
+        """
+        Returns True if stone at cell would create threats on two or more
+        different cells, which the opponent cannot both block.
+        """
+        own, other = self.counts[stone], self.counts[3 - stone]
+        build = self.k - 2
+        targets = set()
+        for w in self.cell_windows[cell]:
+            if own[w] == build and not other[w]:
+                targets.add(self.other_empty(w, cell))
+                if len(targets) > 1:
+                    return True
+        return False
+
+    def near_cells(self):
+        """
+        Returns the empty cells within the radius of a stone.
+        """
+        stones, near = self.stones, self.near
+        return [i for i in range(self.size) if near[i] and not stones[i]]
+
+    def candidates(self, stone):
+        """
+        Returns the moves worth searching for stone, best first.
+
+        A win is played at once and an opponent threat must be blocked.
+        Otherwise only cells near stones are returned, forks first, then by
+        how much the cell adds to both players' open windows.
+        """
+        wins = self.winning_cells(stone)
+        if wins:
+            return wins
+        blocks = self.winning_cells(3 - stone)
+        if blocks:
+            return blocks
+        if not self.placed:
+            return [(self.rows // 2) * self.cols + self.cols // 2]
+
+        own, other = self.counts[stone], self.counts[3 - stone]
+        build = self.k - 2
+        cell_windows = self.cell_windows
+        scored = []
+        for cell in self.near_cells():
+            priority = 0
+            mine_building = theirs_building = 0
+            for w in cell_windows[cell]:
+                mine, theirs = own[w], other[w]
+                if not theirs:
+                    priority += 1 << (2 * mine)
+                    mine_building += mine == build
+                elif not mine:
+                    priority += 1 << (2 * theirs)
+                    theirs_building += theirs == build
+            # a fork needs two windows one stone short of a threat; only
+            # then check that their threats land on different cells
+            if mine_building > 1 and self.is_fork(cell, stone):
+                priority += FORK_BONUS
+            elif theirs_building > 1 and self.is_fork(cell, 3 - stone):
+                priority += FORK_BONUS >> 1
+            scored.append((-priority, cell))
+        scored.sort()
+        return [cell for _, cell in scored]
+
+    ## Game events ##
+    def on_move(self, game, index, stone):
+        self.place(index, stone)
+
+    def on_undo(self, game, index, stone):
+        self.remove(index, stone)
+
+    def on_reset(self, game):
+        self.reset(game.board)
@@ -0,0 +1,234 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ai import AlphaBetaPlayer, GreedyPlayer, RandomPlayer
+from board import Board
+from game import Game, X, O, DRAW
+from mcts import MCTSPlayer
+
+
+ELO_START = 1500
+DEFAULT_CHUNK_SIZE = 20
+
+
+def make_player(spec, seed):
+    """
+    Builds a computer player from its name.
+
+    Parameters:
+    - spec (str): "random", "greedy", "alphabeta:DEPTH" (e.g. "alphabeta:3")
+      or "mcts:PLAYOUTS" (e.g. "mcts:2000").
+    - seed (str): The random seed for players that need one.
+
+    Returns:
+    - object: A player with a choose_move(game) method.
+    """
+    name, _, arg = spec.partition(":")
+    if name == "random":
+        return RandomPlayer(seed)
+    if name == "greedy":
+        return GreedyPlayer(seed)
+    if name == "alphabeta":
+        # fixed depth and no time limit so results do not depend on the machine
+        return AlphaBetaPlayer(time_budget=None, max_depth=int(arg or 2))
+    if name == "mcts":
+        # a playout limit instead of a time budget, for the same reason
+        return MCTSPlayer(time_budget=None, max_playouts=int(arg or 1000), seed=seed)
+    raise ValueError(f"Unknown player {spec!r}: use random, greedy, alphabeta:DEPTH or mcts:PLAYOUTS.")
+
+
+def parse_board(spec):
+    """
+    Parses a board size such as "3", "5x5" or "15x15:5" into (rows, cols, k).
+    """
+    size, _, k = spec.partition(":")
+    rows, _, cols = size.partition("x")
+    board = Board(int(rows), int(cols or rows), int(k) if k else None)
+    return board.rows, board.cols, board.k
+
+
+def play_game(player_x, player_o, rows, cols, k):
+    """
+    Plays one game between two computer players.
+
+    Returns:
+    - tuple: (winner, number of moves) with winner X, O or DRAW.
+    """
+    game = Game(rows, cols, k)
+    players = {X: player_x, O: player_o}
+    while not game.is_over():
+        game.play(players[game.to_move].choose_move(game))
+    return game.winner, len(game.moves)
+
+
+def play_chunk(task):
+    """
+    Plays a chunk of games for one pairing in a worker process.
+
+    Each game's seed comes from the tournament seed, the chunk id and the
+    game's position in the chunk, so results do not depend on which worker
+    runs the chunk.
+
+    Parameters:
+    - task (tuple): (seed, chunk id, X player spec, O player spec, (rows, cols, k), games).
+
+    Returns:
+    - list: One result dict per game.
+    """
+    seed, chunk_id, spec_x, spec_o, board, games = task
+    results = []
+    for game_id in range(games):
+        game_seed = f"{seed}:{chunk_id}:{game_id}"
+        player_x = make_player(spec_x, game_seed + ":x")
+        player_o = make_player(spec_o, game_seed + ":o")
+        winner, length = play_game(player_x, player_o, *board)
+        results.append(
+            {
+                "x": spec_x,
+                "o": spec_o,
+                "board": "{}x{}:{}".format(*board),
+                "winner": {X: "x", O: "o", DRAW: "draw"}[winner],
+                "length": length,
+            }
+        )
+    return results
+
+
+def schedule(players, boards, games, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Splits a round robin into chunks of games.
+
+    Every ordered pair of different players meets on every board, games
+    times with each color.
+
+    Returns:
+    - list: Tasks for play_chunk.
+    """
+    tasks = []
+    for board in boards:
+        for spec_x, spec_o in itertools.permutations(players, 2):
+            for start in range(0, games, chunk_size):
+                tasks.append(
+                    (seed, len(tasks), spec_x, spec_o, board, min(chunk_size, games - start))
+                )
+    return tasks
+
+
+def run_tournament(players, boards, games, seed=0, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Runs the tournament across a process pool and streams results back.
+
+    Parameters:
+    - players (list): Player specs for make_player.
+    - boards (list): (rows, cols, k) tuples.
+    - games (int): Games per ordered pairing and board.
+    - seed (int): The tournament seed.
+    - workers (int): Worker processes. Default is the number of CPUs.
+    - chunk_size (int): Games sent to a worker at once.
+
+    Yields:
+    - dict: One result per game, as soon as its chunk finishes.
+    """
+    tasks = schedule(players, boards, games, seed, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for future in as_completed([pool.submit(play_chunk, task) for task in tasks]):
+            yield from future.result()
+
+
+def add_result(table, result):
+    """
+    Adds one game to a crosstable: 1 point for a win and 0.5 for a draw.
+
+    Parameters:
+    - table (dict): {(player, opponent): [points, games]} counted from
+      player's side; updated in place.
+    - result (dict): A game result from play_chunk.
+    """
+    x, o = result["x"], result["o"]
+    points = {"x": 1.0, "o": 0.0, "draw": 0.5}[result["winner"]]
+    for player, opponent, score in ((x, o, points), (o, x, 1.0 - points)):
+        entry = table.setdefault((player, opponent), [0.0, 0])
+        entry[0] += score
+        entry[1] += 1
+
+
+def elo_ratings(table, iterations=200):
+    """
+    Fits Elo ratings to a crosstable.
+
+    The fit runs over the totals rather than game by game, so the ratings
+    do not depend on the order in which results arrived.
+
+    Returns:
+    - dict: {player: rating}
+    """
+    players = sorted({player for player, _ in table})
+    ratings = {player: float(ELO_START) for player in players}
+    for _ in range(iterations):
+        for player in players:
+            delta, games = 0.0, 0
+            for (a, b), (points, n) in table.items():
+                if a != player:
+                    continue
+                expected = 1.0 / (1.0 + 10 ** ((ratings[b] - ratings[a]) / 400))
+                delta += points - n * expected
+                games += n
+            if games:
+                ratings[player] += 400 * delta / games
+        # keep the average at the starting rating
+        shift = ELO_START - sum(ratings.values()) / len(ratings)
+        for player in players:
+            ratings[player] += shift
+    return ratings
+
+
+def format_report(table):
+    """
+    Returns the Elo ranking and crosstable as text.
+    """
+    ratings = elo_ratings(table)
+    players = sorted(ratings, key=ratings.get, reverse=True)
+    width = max(len(player) for player in players) + 2
+    games = sum(n for _, n in table.values()) // 2
+    lines = [f"{games} games", "", "Elo:"]
+    for player in players:
+        lines.append(f"  {player:<{width}}{ratings[player]:7.0f}")
+    lines += ["", "Crosstable (points of row player vs column player):"]
+    lines.append(" " * width + "".join(f"{player:>{width}}" for player in players))
+    for player in players:
+        cells = []
+        for opponent in players:
+            points, games = table.get((player, opponent), (0.0, 0))
+            cells.append(f"{points:g}/{games}" if games else "-")
+        lines.append(f"{player:<{width}}" + "".join(f"{cell:>{width}}" for cell in cells))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round-robin tournament between computer players.")
+    parser.add_argument("--players", nargs="+", default=["random", "greedy", "alphabeta:2"])
+    parser.add_argument("--boards", nargs="+", default=["3"], help='e.g. "3", "5x5:4", "15x15:5"')
+    parser.add_argument("--games", type=int, default=50, help="games per ordered pairing and board")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    table = {}
+    played = 0
+    total = len(args.boards) * len(args.players) * (len(args.players) - 1) * args.games
+    for result in run_tournament(
+        args.players,
+        [parse_board(board) for board in args.boards],
+        args.games,
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    ):
+        add_result(table, result)
+        played += 1
+        if played % 100 == 0 or played == total:
+            print(f"\r{played}/{total} games", end="", flush=True)
+    print()
+    print(format_report(table))
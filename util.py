@@ -1,5 +1,6 @@
 from enum import Enum
 import tkinter as tk
+from board import default_win_length
 
 
 class Player(Enum):
@@ -9,8 +10,8 @@ class Player(Enum):
 
 
 class Messages(Enum):
-    WARNING_SPEECH = "Please specify the row and column by saying two numbers between one and the size of the chosen board type. For example, say 'first row and second column' to place your move in the first row and second column."
-    WARNING_TEXT = "Please specify the row and column by stating two numbers between one and the size of the chosen board type. For instance, you can type 'first row and second column' to indicate the first row and second column. Alternatively, you can type '1 row and 2 column' or simply '1 2' separated with space."
+    WARNING_SPEECH = "Please specify the row and column by saying two numbers between one and the size of the chosen board type. For example, say 'first row and second column' to place your move in the first row and second column. Say 'undo' or 'redo' to take back or replay a move."
+    WARNING_TEXT = "Please specify the row and column by stating two numbers between one and the size of the chosen board type. For instance, you can type 'first row and second column' to indicate the first row and second column. Alternatively, you can type '1 row and 2 column' or simply '1 2' separated with space. Type 'undo' or 'redo' to take back or replay a move."
     QUIT = "Do you want to quit the game? (y/n): "
     REMATCH = "{0}\nrematch?"
     GAME_OVER = "Game over!"
@@ -18,11 +19,9 @@ class Messages(Enum):
     INPUT_TYPE_ERROR = "input_type must be 1 for text input or 2 for speech input: {0} is not a valid input type."
     WINNER = "Player {0} wins :)"
     DRAW = "It's a draw :|"
-    GOOGLE_UNKNOWN_ERROR = "Google Speech Recognition could not understand audio!"
-    GOOGLE_REQUEST_ERROR = (
-        "Could not request results from Google Speech Recognition service; {0}"
-    )
-    GOOGLE_SPEECH = "Google Speech Recognition thinks you said: {0}"
+    SPEECH_UNKNOWN_ERROR = "{0} could not understand audio!"
+    SPEECH_REQUEST_ERROR = "Could not request results from {0}; {1}"
+    SPEECH_RESULT = "{0} thinks you said: {1} ({2:.0f} ms)"
 
 
 class BoardInputTypeDialog(tk.Toplevel):
@@ -30,8 +29,11 @@ class BoardInputTypeDialog(tk.Toplevel):
     A dialog box for choosing the board type and input type.
 
     Attributes:
-        board_type: The chosen board type.
+        board_type: The chosen board type as a (rows, cols, k) tuple.
         input_type: The chosen input type.
+        opponent: The chosen opponent, 1 for a human, 2 for the computer
+            (alpha-beta search) and 3 for the computer using Monte Carlo
+            tree search.
     """
 
     def __init__(self, parent):
@@ -43,21 +45,23 @@ class BoardInputTypeDialog(tk.Toplevel):
         """
         super().__init__(parent)
         self.title("Board type and Input type")
-        self.geometry("320x150")  # Adjust the size to fit the new buttons
+        self.geometry("360x240")  # Adjust the size to fit the new buttons
         self.resizable(False, False)
         self.board_type = tk.IntVar(master=parent)
         self.input_type = tk.IntVar(master=parent)
+        self.opponent = tk.IntVar(master=parent)
         self.board_type.set(0)
         self.input_type.set(0)
+        self.opponent.set(1)
         self.confirm_button = tk.Button(
             self, text="Confirm", command=self.set_types, state="disabled"
         )
-        self.confirm_button.grid(row=4, column=0, columnspan=3, pady=10)
+        self.confirm_button.grid(row=7, column=0, columnspan=3, pady=10)
 
         # Configure the grid to center the widgets
         for i in range(3):
             self.columnconfigure(i, weight=1)
-        for i in range(5):
+        for i in range(8):
             self.rowconfigure(i, weight=1)
         tk.Label(self, text="Choose a board type:").grid(
             row=0, column=0, columnspan=3, sticky="nsew"
@@ -83,8 +87,28 @@ class BoardInputTypeDialog(tk.Toplevel):
             value=7,
             command=self.check_selection,
         ).grid(row=1, column=2, padx=10, sticky="nsew")
+        tk.Radiobutton(
+            self,
+            text="Custom",
+            variable=self.board_type,
+            value=-1,
+            command=self.check_selection,
+        ).grid(row=2, column=0, padx=10, sticky="nsew")
+        # rows, columns and k in a row for custom boards (e.g. 15x15 gomoku)
+        custom_frame = tk.Frame(self)
+        custom_frame.grid(row=2, column=1, columnspan=2, sticky="nsew")
+        self.custom_rows = tk.Spinbox(custom_frame, from_=3, to=25, width=3)
+        self.custom_cols = tk.Spinbox(custom_frame, from_=3, to=25, width=3)
+        self.custom_k = tk.Spinbox(custom_frame, from_=3, to=25, width=3)
+        for text, spinbox in (
+            ("rows", self.custom_rows),
+            ("cols", self.custom_cols),
+            ("k", self.custom_k),
+        ):
+            tk.Label(custom_frame, text=text).pack(side="left")
+            spinbox.pack(side="left")
         tk.Label(self, text="Choose an input type:").grid(
-            row=2, column=0, columnspan=3, sticky="nsew"
+            row=3, column=0, columnspan=3, sticky="nsew"
         )
         tk.Radiobutton(
             self,
@@ -92,14 +116,35 @@ class BoardInputTypeDialog(tk.Toplevel):
             variable=self.input_type,
             value=1,
             command=self.check_selection,
-        ).grid(row=3, column=0, padx=10, sticky="nsew")
+        ).grid(row=4, column=0, padx=10, sticky="nsew")
         tk.Radiobutton(
             self,
             text="Speech",
             variable=self.input_type,
             value=2,
             command=self.check_selection,
-        ).grid(row=3, column=1, padx=10, sticky="nsew")
+        ).grid(row=4, column=1, padx=10, sticky="nsew")
+        tk.Label(self, text="Choose an opponent:").grid(
+            row=5, column=0, columnspan=3, sticky="nsew"
+        )
+        tk.Radiobutton(
+            self,
+            text="Human",
+            variable=self.opponent,
+            value=1,
+        ).grid(row=6, column=0, padx=10, sticky="nsew")
+        tk.Radiobutton(
+            self,
+            text="Computer",
+            variable=self.opponent,
+            value=2,
+        ).grid(row=6, column=1, padx=10, sticky="nsew")
+        tk.Radiobutton(
+            self,
+            text="MCTS",
+            variable=self.opponent,
+            value=3,
+        ).grid(row=6, column=2, padx=10, sticky="nsew")
 
     def check_selection(self):
         """
@@ -110,12 +155,28 @@ class BoardInputTypeDialog(tk.Toplevel):
 
     def set_types(self):
         """
-        Set the board type and input type and close the dialog box.
+        Set the board type, input type and opponent and close the dialog box.
         """
-        self.board_type = self.board_type.get()
+        board_type = self.board_type.get()
+        if board_type == -1:
+            try:
+                rows = int(self.custom_rows.get())
+                cols = int(self.custom_cols.get())
+                k = int(self.custom_k.get())
+            except ValueError:
+                return
+            # keep the dialog open until the line fits on the board
+            if min(rows, cols, k) < 3 or k > max(rows, cols):
+                return
+        else:
+            rows = cols = board_type
+            k = default_win_length(rows, cols)
+        self.board_type = (rows, cols, k)
         self.input_type = self.input_type.get()
-        print("Board type:", f"{self.board_type}x{self.board_type}")
+        self.opponent = self.opponent.get()
+        print("Board type:", f"{rows}x{cols}, {k} in a row")
         print("Input type:", "Text" if self.input_type == 1 else "Speech")
+        print("Opponent:", {1: "Human", 2: "Computer", 3: "Computer (MCTS)"}[self.opponent])
         self.destroy()
 
 